@@ -0,0 +1,189 @@
+"""
+Append-only WARC-style archive of every fetched response, shared by the
+fetch engine and the Playwright helper.
+
+Records are appended to segment files (<root>/segments/*.warc.gz), each
+record its own gzip member: a segment is a valid .warc.gz for standard WARC
+tools, and any record can be decompressed on its own. Every process appends
+to its own segment, so writers never interleave; an SQLite index (WAL)
+maps URL and time to (segment, offset, length). Readers memory-map the
+segments and only touch the bytes of the records they read.
+"""
+import os
+import time
+import uuid
+import zlib
+import hashlib
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+
+# Headers describing the wire encoding; bodies are archived decoded, so these are replaced
+WIRE_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+SEGMENT_BYTES = 1 << 30 # Roll over to a new segment past this size
+COMPRESS_LEVEL = 6
+
+ArchiveRecord = namedtuple("ArchiveRecord", ["record_id", "url", "warc_type", "fetched_at", "status", "content_type", "digest", "segment", "offset", "length"])
+ArchiveEntry = namedtuple("ArchiveEntry", ["record", "warc_headers", "http_headers", "body"])
+
+def _parse_headers(block: bytes) -> dict:
+    headers = {}
+    for line in block.decode("utf-8", "replace").split("\r\n"):
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip()] = value.strip()
+    return headers
+
+class Archive:
+    """Thread-safe; appends open this process's segment lazily, so read-only users never create one."""
+    def __init__(self, root: str, segment_bytes: int = SEGMENT_BYTES):
+        import sqlite3
+
+        self.root = root
+        self.segment_dir = os.path.join(root, "segments")
+        self.segment_bytes = segment_bytes
+        os.makedirs(self.segment_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+        self._segment = None
+        self._maps = {} # segment -> mmap
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL") # The app, CLI runs and helpers all append
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS records (
+                    id INTEGER PRIMARY KEY, url TEXT, warc_type TEXT, fetched_at REAL, status INTEGER,
+                    content_type TEXT, digest TEXT, segment TEXT, offset INTEGER, length INTEGER
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS records_by_url ON records (url, fetched_at)")
+
+    # --- Writing ---
+
+    def _open_segment(self):
+        if self._file is not None and self._file.tell() < self.segment_bytes:
+            return self._file
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        self._segment = f"{stamp}-{os.getpid()}-{uuid.uuid4().hex[:8]}.warc.gz"
+        self._file = open(os.path.join(self.segment_dir, self._segment), "ab")
+        return self._file
+
+    def append(self, url: str, body: bytes, content_type: str = "text/html; charset=utf-8",
+               status: int = None, headers: dict = None) -> ArchiveRecord:
+        """
+        Archives one body. With a status it is a WARC "response" record carrying
+        the HTTP status line and headers; without, a "resource" record (e.g. a
+        rendered DOM snapshot, which no server ever sent as such). `body` is
+        the decoded payload (httpx and Playwright both decompress), so the
+        stored headers drop Content-Encoding/Transfer-Encoding and give its length.
+        """
+        fetched_at = time.time()
+        digest = hashlib.sha256(body).hexdigest()
+        if status is not None:
+            warc_type = "response"
+            http_head = [f"HTTP/1.1 {status}"] + [f"{k}: {v}" for k, v in (headers or {}).items() if k.lower() not in WIRE_HEADERS]
+            http_head.append(f"Content-Length: {len(body)}")
+            block = ("\r\n".join(http_head) + "\r\n\r\n").encode("utf-8") + body
+            block_type = "application/http; msgtype=response"
+        else:
+            warc_type, block, block_type = "resource", body, content_type
+        warc_head = [
+            "WARC/1.1",
+            f"WARC-Type: {warc_type}",
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+            f"WARC-Date: {datetime.fromtimestamp(fetched_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}",
+            f"WARC-Target-URI: {url}",
+            f"WARC-Payload-Digest: sha256:{digest}",
+            f"Content-Type: {block_type}",
+            f"Content-Length: {len(block)}",
+        ]
+        record = ("\r\n".join(warc_head) + "\r\n\r\n").encode("utf-8") + block + b"\r\n\r\n"
+        # A gzip member per record: wbits=31 writes the gzip header and trailer
+        packer = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+        member = packer.compress(record) + packer.flush()
+
+        with self._lock:
+            f = self._open_segment()
+            offset = f.tell()
+            f.write(member)
+            f.flush() # Bytes reach the OS before the index points at them
+            with self._conn:
+                cur = self._conn.execute(
+                    "INSERT INTO records (url, warc_type, fetched_at, status, content_type, digest, segment, offset, length) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (url, warc_type, fetched_at, status, content_type, digest, self._segment, offset, len(member))
+                )
+        return ArchiveRecord(cur.lastrowid, url, warc_type, fetched_at, status, content_type, digest, self._segment, offset, len(member))
+
+    # --- Reading ---
+
+    def records(self, url_contains: str = None, since: float = None, content_type: str = None) -> list[ArchiveRecord]:
+        """Index entries, oldest first, filtered by URL substring, time and Content-Type substring."""
+        query = "SELECT * FROM records WHERE fetched_at >= ?"
+        params = [since or 0]
+        if url_contains:
+            query += " AND instr(url, ?) > 0"
+            params.append(url_contains)
+        if content_type:
+            query += " AND instr(content_type, ?) > 0"
+            params.append(content_type)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [ArchiveRecord(*row) for row in rows]
+
+    def history(self, url: str) -> list[ArchiveRecord]:
+        """Every archived capture of exactly this URL, oldest first (for diffing versions)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM records WHERE url = ? ORDER BY id", (url,)).fetchall()
+        return [ArchiveRecord(*row) for row in rows]
+
+    def raw(self, record: ArchiveRecord) -> memoryview:
+        """The record's compressed gzip member: a zero-copy view into the mapped segment."""
+        import mmap
+
+        end = record.offset + record.length
+        with self._lock:
+            mapped = self._maps.get(record.segment)
+            if mapped is None or len(mapped) < end:
+                # New segment, or it grew past our mapping since: map it again. The old
+                # map is only dropped, views still handed out keep it alive
+                with open(os.path.join(self.segment_dir, record.segment), "rb") as f:
+                    mapped = self._maps[record.segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(mapped)[record.offset:end]
+
+    def read(self, record: ArchiveRecord) -> ArchiveEntry:
+        data = zlib.decompressobj(31).decompress(self.raw(record))
+        head, _, block = data.partition(b"\r\n\r\n")
+        warc_headers = _parse_headers(head)
+        block = block[:int(warc_headers.get("Content-Length", len(block)))]
+        http_headers = {}
+        if record.warc_type == "response":
+            http_head, _, block = block.partition(b"\r\n\r\n")
+            http_headers = _parse_headers(http_head) # The status line has no colon and drops out
+        return ArchiveEntry(record, warc_headers, http_headers, block)
+
+    def body(self, record: ArchiveRecord) -> bytes:
+        return self.read(record).body
+
+    def text(self, record: ArchiveRecord) -> str:
+        return self.body(record).decode("utf-8", "replace")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._maps.clear() # Maps close once no view refers to them
+            self._conn.close()
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+def open_archive(root: str) -> Archive:
+    """One Archive per root and process, so each process appends to a single segment."""
+    with _archives_lock:
+        archive = _archives.get(root)
+        if archive is None:
+            archive = _archives[root] = Archive(root)
+        return archive
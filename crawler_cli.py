@@ -0,0 +1,236 @@
+"""
+Headless batch runs: fetch many URLs and stream the extracted rows to disk,
+or re-run extraction over pages already in the page store.
+
+    python -m crawler run --urls urls.txt --mode pagination --next-selector ".next" \
+        --container ".card" --map map.json --out results.parquet
+    python -m crawler replay --url-contains example.com --container ".card" --map map.json --out results.csv
+
+Only uses crawler_core, so Streamlit is never imported.
+Output format follows the extension: .csv, .csv.gz, .ndjson/.jsonl, .parquet, .xlsx.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import crawler_core
+from crawler_core import ExtractionBatch, extract_json_records, open_row_writer
+
+# Row-shaped page records that can be written out
+ROW_KINDS = ["custom", "emails", "phones", "addresses", "socials", "links", "companies", "portfolios", "images", "metadata"]
+
+def add_extraction_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--out", required=True, help="Output file: .csv, .csv.gz, .ndjson, .jsonl, .parquet or .xlsx")
+    extract = parser.add_argument_group("extraction")
+    extract.add_argument("--extract", choices=ROW_KINDS, default=None, help="What to write (default: custom with --map, else links)")
+    extract.add_argument("--container", default="", help="Parent container selector for custom extraction")
+    extract.add_argument("--map", default=None, help="JSON file with the relative selectors, as in the sidebar")
+    extract.add_argument("--selector-type", choices=["CSS", "XPath", "JSONPath"], default="CSS")
+    extract.add_argument("--attr", choices=["text", "href", "src", "class"], default="text")
+    extract.add_argument("--extra-social-domains", default="", help="Comma-separated domain or domain=Label entries")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m crawler", description="Crawl without the Streamlit UI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run = commands.add_parser("run", help="Fetch a list of URLs and extract them")
+    run.add_argument("--urls", required=True, help="File with one URL per line ('-' for stdin). Blank lines and # comments are skipped.")
+    run.add_argument("--concurrency", type=int, default=4, help="URLs fetched at the same time (also the browser pool size)")
+    run.add_argument("--verbose", action="store_true", help="Also print the Playwright debug log and cache hits")
+    add_extraction_args(run)
+
+    fetch = run.add_argument_group("fetching")
+    fetch.add_argument("--mode", choices=["single", "pagination", "list_detail"], default="single")
+    fetch.add_argument("--dynamic", action="store_true", help="Use the headless browser even for single pages")
+    fetch.add_argument("--proxy", default=None)
+    fetch.add_argument("--wait", type=int, default=12, help="Max page load wait (s)")
+    fetch.add_argument("--ready-mode", choices=["networkidle", "selector", "dom_quiet", "response", "fixed"], default="networkidle",
+                       help="List-Detail's detail pages use networkidle instead of selector/response")
+    fetch.add_argument("--ready-selector", default="")
+    fetch.add_argument("--ready-url", default="")
+    fetch.add_argument("--block", choices=["balanced", "keep_xhr", "text_only", "off"], default="balanced")
+    fetch.add_argument("--next-selector", default="", help="Pagination: Next button selector (default: numbered .v-pagination__item buttons)")
+    fetch.add_argument("--max-pages", type=int, default=3)
+    fetch.add_argument("--detail-selector", default="", help="List-Detail: detail link selector")
+    fetch.add_argument("--max-items", type=int, default=5)
+    fetch.add_argument("--detail-fetch", choices=["browser", "http"], default="browser")
+    fetch.add_argument("--capture-url", default=None, help="Capture JSON API responses whose URL contains this")
+    fetch.add_argument("--max-age", type=float, default=0, help="Reuse page store fetches up to this many seconds old (default: always fetch; fetches are stored either way)")
+
+    replay = commands.add_parser("replay", help="Re-extract pages from the page store, without fetching")
+    replay.add_argument("--url-contains", default="", help="Only fetches whose URL contains this (default: all)")
+    replay.add_argument("--since-hours", type=float, default=None, help="Only fetches from the last N hours")
+    replay.add_argument("--all-fetches", action="store_true", help="Every stored fetch, not just the latest per URL and configuration")
+    add_extraction_args(replay)
+    return parser
+
+def read_urls(path: str) -> list[str]:
+    if path == "-":
+        urls = [line.strip() for line in sys.stdin]
+    else:
+        with open(path, encoding="utf-8") as f:
+            urls = [line.strip() for line in f]
+    return list(dict.fromkeys(u for u in urls if u and not u.startswith("#")))
+
+def build_automation(args) -> dict:
+    """The same automation dict the sidebar builds, or None for a plain static fetch."""
+    if args.mode == "single" and not args.dynamic and not args.capture_url:
+        return None
+    automation = {"type": args.mode, "wait_time": args.wait, "ready_mode": args.ready_mode, "block_profile": args.block}
+    if args.ready_mode == "selector":
+        automation["ready_selector"] = args.ready_selector
+    elif args.ready_mode == "response":
+        automation["ready_url"] = args.ready_url
+    if args.mode == "pagination":
+        automation["next_selector"] = args.next_selector
+        automation["max_pages"] = args.max_pages
+    elif args.mode == "list_detail":
+        automation["detail_selector"] = args.detail_selector
+        automation["max_items"] = args.max_items
+        automation["detail_fetch"] = args.detail_fetch
+    if args.capture_url is not None:
+        automation["capture"] = True
+        automation["capture_url"] = args.capture_url
+    return automation
+
+def log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+def wrote(writer, path: str) -> str:
+    """Summary of a finished writer. Without any rows there were no columns, so no file was created."""
+    if writer.columns is None:
+        return f"⚠️ No rows extracted, {path} was not written"
+    return f"📥 Wrote {writer.rows_written} row(s) to {path}"
+
+def crawl_one(url: str, args, automation: dict, relative_map: str) -> tuple[list[dict], str, int, float]:
+    """Fetches and extracts one URL. Returns (rows, error, page count, elapsed)."""
+    batch = ExtractionBatch(args.extra_social_domains, custom_spec_of(args, relative_map), kinds=(args.extract,))
+
+    def on_event(kind, payload):
+        if kind == "warning":
+            log(f"⚠️ {url}: {payload}")
+        elif kind == "revalidated" and args.verbose:
+            log(f"♻️ {url}: unchanged (304), served from the HTTP cache")
+        elif kind == "stored" and payload["hit"] and args.verbose:
+            log(f"♻️ {url}: served from the page store")
+        elif kind == "debug_log" and args.verbose:
+            for line in payload:
+                log(f"   {url}: {line}")
+
+    htmls, final_url, elapsed, api_payloads = crawler_core.fetch_url_content_stored(
+        url, args.proxy, args.dynamic, automation, on_page=batch.submit, on_event=on_event, max_age=args.max_age
+    )
+    if htmls is None:
+        return [], final_url, 0, 0 # final_url holds the error message
+
+    if args.extract == "custom" and args.selector_type == "JSONPath":
+        pages = [extract_json_records(api_payloads, args.container, relative_map)]
+    else:
+        pages = [record[args.extract] for record in batch.results(htmls, final_url)]
+
+    rows, error = [], None
+    for i, page_rows in enumerate(pages):
+        page_rows, page_error = to_output_rows(url, i, page_rows)
+        rows.extend(page_rows)
+        error = error or page_error
+    return rows, (error if not rows else None), len(htmls), elapsed
+
+def to_output_rows(url: str, page_index: int, page_rows: list[dict]) -> tuple[list[dict], str]:
+    """Adds the source columns to one page's rows; an error record comes back as the error instead."""
+    if page_rows and "Error" in page_rows[0]:
+        return [], page_rows[0]["Error"]
+    rows = []
+    for row in page_rows or []:
+        row = {"Source URL": url, "Source Page": page_index + 1, **row}
+        row.pop("Block Index", None)
+        rows.append(row)
+    return rows, None
+
+def custom_spec_of(args, relative_map: str) -> tuple:
+    if args.extract == "custom" and args.selector_type != "JSONPath":
+        return (args.container, relative_map, args.attr, args.selector_type)
+    return None
+
+def replay(args, relative_map: str) -> int:
+    """Re-extracts stored pages in bulk; no network, no browser."""
+    store = crawler_core.get_page_store()
+    since = time.time() - args.since_hours * 3600 if args.since_hours else None
+    pages = store.stored_pages(args.url_contains, since, latest_only=not args.all_fetches)
+    fetch_count = len({p.fetch_id for p in pages})
+    log(f"♻️ Re-extracting {len(pages)} stored page(s) from {fetch_count} fetch(es) -> {args.out}")
+    
+    start_time = time.time()
+    failures = 0
+    with open_row_writer(args.out) as writer:
+        if args.extract == "custom" and args.selector_type == "JSONPath":
+            seen = set()
+            for page in pages:
+                if page.fetch_id in seen:
+                    continue
+                seen.add(page.fetch_id)
+                records = extract_json_records(store.payloads(page.fetch_id), args.container, relative_map)
+                rows, error = to_output_rows(page.url, 0, records)
+                failures += bool(error)
+                writer.write(rows)
+        else:
+            step = max(1, len(pages) // 20)
+            def on_progress(done, total):
+                if done % step == 0 or done == total:
+                    log(f"[{done}/{total}] pages re-extracted")
+            
+            results = crawler_core.replay_extraction(
+                pages, args.extra_social_domains, custom_spec_of(args, relative_map), (args.extract,), store, on_progress
+            )
+            for page, record in results:
+                rows, error = to_output_rows(page.url, page.index, record[args.extract])
+                failures += bool(error)
+                writer.write(rows)
+    
+    log(f"{wrote(writer, args.out)} in {round(time.time() - start_time, 2)}s ({failures} page(s) without matches)")
+    return 0
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.extract is None:
+        args.extract = "custom" if args.map else "links"
+    if args.extract == "custom" and not (args.map and args.container):
+        log("❌ Custom extraction needs both --container and --map")
+        return 2
+    relative_map = None
+    if args.map:
+        with open(args.map, encoding="utf-8") as f:
+            relative_map = json.dumps(json.load(f)) # Validate early; the plan re-parses it
+    args.extra_social_domains = tuple(e.strip() for e in args.extra_social_domains.split(",") if e.strip())
+    if args.command == "replay":
+        return replay(args, relative_map)
+
+    urls = read_urls(args.urls)
+    automation = build_automation(args)
+    if automation:
+        crawler_core.get_playwright_pool(size=max(1, args.concurrency))
+    log(f"🕷️ Crawling {len(urls)} URL(s), {args.concurrency} at a time -> {args.out}")
+
+    start_time = time.time()
+    failures = 0
+    with open_row_writer(args.out) as writer, ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as fetchers:
+        futures = {fetchers.submit(crawl_one, url, args, automation, relative_map): url for url in urls}
+        for done, future in enumerate(as_completed(futures), 1):
+            url = futures[future]
+            try:
+                rows, error, page_count, elapsed = future.result()
+            except Exception as e:
+                rows, error, page_count, elapsed = [], str(e), 0, 0
+            writer.write(rows)
+            if error:
+                failures += 1
+                log(f"[{done}/{len(urls)}] ❌ {url}: {error}")
+            else:
+                log(f"[{done}/{len(urls)}] ✅ {url}: {page_count} page(s), {len(rows)} row(s) in {elapsed}s")
+
+    log(f"{wrote(writer, args.out)} in {round(time.time() - start_time, 2)}s ({failures} failed)")
+    return 1 if failures == len(urls) and urls else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
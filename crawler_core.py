@@ -0,0 +1,2115 @@
+"""
+The crawler's fetch & extraction engine, free of any UI.
+crawler.py (Streamlit) and crawler_cli.py (headless batch runs) both drive it;
+progress is reported through on_page / on_event callbacks.
+"""
+import os
+import re
+import time
+import random
+import threading
+from urllib.parse import urljoin, urlparse
+from collections import Counter, namedtuple
+import json
+
+from functools import lru_cache, cached_property, wraps
+from contextlib import contextmanager
+from lxml import etree
+from lxml import html as lxml_html # One parse for CSS, XPath and text
+
+from politeness import HostScheduler, host_of, parse_retry_after
+from archive import Archive, open_archive
+
+# pandas, httpx and cssselect are imported on first use: pool workers and
+# CLI runs that never build a table or fetch statically don't pay for them
+
+# ========== CONFIG & UTILS ==========
+
+# A list of agents to rotate through to avoid basic bot detection
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+]
+
+def get_random_header():
+    return {
+        "User-Agent": random.choice(USER_AGENTS),
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+        "Accept-Language": "en-US,en;q=0.5",
+        "Referer": "https://www.google.com/"
+    }
+
+def clean_text(text: str) -> str:
+    """Standardizes text cleaning."""
+    if not text:
+        return ""
+    # Remove excessive whitespace
+    return re.sub(r"\s+", " ", text).strip()
+
+# ========== PLAYWRIGHT FETCH ENGINE ==========
+
+PLAYWRIGHT_POOL_SIZE = 2         # Warm browser processes kept alive
+PLAYWRIGHT_MAX_PAGES = 50        # Each worker relaunches its browser after this many pages
+PLAYWRIGHT_TIMEOUT = 120         # Seconds allowed per fetch
+
+def zstd_available() -> bool:
+    try:
+        import zstandard # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class PlaywrightWorker:
+    """
+    One long-lived `playwright_helper.py --serve` subprocess.
+    Requests go in as JSON lines on stdin; answers stream back as JSON lines on stdout.
+    """
+    def __init__(self, helper_path: str, max_pages: int = PLAYWRIGHT_MAX_PAGES):
+        import subprocess
+        import sys
+        import threading
+        import queue
+        from collections import deque
+        
+        self.proc = subprocess.Popen(
+            [sys.executable, helper_path, "--serve", "--max-pages", str(max_pages)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+        self._next_id = 0
+        self._responses = queue.Queue()
+        self._stdin_lock = threading.Lock() # Requests and "paced" answers come from different threads
+        self._stderr_tail = deque(maxlen=50)
+        
+        # Pump both pipes in background threads so reads can time out and stderr never blocks
+        threading.Thread(target=self._pump_stdout, daemon=True).start()
+        threading.Thread(target=self._pump_stderr, daemon=True).start()
+
+    def _pump_stdout(self):
+        for line in self.proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self._responses.put(json.loads(line))
+            except json.JSONDecodeError:
+                self._stderr_tail.append(line) # Stray output, keep it for diagnostics
+        self._responses.put(None) # EOF: the worker died
+
+    def _pump_stderr(self):
+        for line in self.proc.stderr:
+            self._stderr_tail.append(line.rstrip())
+
+    def is_alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def send(self, payload: dict):
+        """Writes one JSON line to the worker's stdin."""
+        try:
+            with self._stdin_lock:
+                self.proc.stdin.write(json.dumps(payload) + "\n")
+                self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            raise Exception(f"Playwright worker is not running: {self.stderr_tail()}")
+
+    def stream(self, payload: dict, timeout: float):
+        """
+        Sends one request and yields its records as they arrive, up to and
+        including the "done" record. `timeout` is the longest allowed silence.
+        """
+        import queue
+        
+        self._next_id += 1
+        request_id = self._next_id
+        self.send(dict(payload, id=request_id))
+        
+        while True:
+            try:
+                record = self._responses.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"Playwright worker was silent for {timeout}s")
+            if record is None:
+                raise Exception(f"Playwright worker exited: {self.stderr_tail()}")
+            if record.get("id") != request_id:
+                continue # A late record of an abandoned request; drop it
+            yield record
+            if record.get("type", "done") == "done":
+                return
+
+    def request(self, payload: dict, timeout: float) -> dict:
+        """Sends one request and returns its final record."""
+        record = None
+        for record in self.stream(payload, timeout):
+            pass
+        return record
+
+    def ping(self, timeout: float = 10) -> bool:
+        """Health check: the process is up and its browser is connected."""
+        if not self.is_alive():
+            return False
+        try:
+            return bool(self.request({"cmd": "ping"}, timeout).get("success"))
+        except Exception:
+            return False
+
+    def stderr_tail(self) -> str:
+        return "\n".join(self._stderr_tail)
+
+    def close(self):
+        if self.is_alive():
+            try:
+                self.send({"cmd": "shutdown"})
+                self.proc.wait(timeout=10)
+            except Exception:
+                self.proc.kill()
+
+class PlaywrightWorkerPool:
+    """
+    A fixed set of warm Playwright workers. Each fetch checks out an idle
+    worker, health-checks it (replacing it if needed) and returns it afterwards.
+    """
+    def __init__(self, size: int = PLAYWRIGHT_POOL_SIZE, max_pages: int = PLAYWRIGHT_MAX_PAGES):
+        import os
+        import queue
+        import atexit
+        
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.helper_path = os.path.join(script_dir, "playwright_helper.py")
+        self.max_pages = max_pages
+        self._idle = queue.Queue()
+        self._workers = []
+        for _ in range(size):
+            self._idle.put(self._spawn())
+        atexit.register(self.close)
+
+    def _spawn(self) -> PlaywrightWorker:
+        worker = PlaywrightWorker(self.helper_path, self.max_pages)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: PlaywrightWorker) -> PlaywrightWorker:
+        worker.proc.kill()
+        self._workers.remove(worker)
+        return self._spawn()
+
+    def fetch_stream(self, url: str, automation: dict, timeout: float = PLAYWRIGHT_TIMEOUT, pacer=None):
+        """
+        Yields the page/payload/log/host_status/done records of one fetch as the
+        worker produces them. Compressed pages are decoded before they are yielded.
+        "pace" records are answered here instead: pacer(host) blocks until the
+        host may get another request, then the worker hears "paced".
+        """
+        import base64
+        
+        def grant(worker, host, ticket):
+            if pacer:
+                pacer(host)
+            try:
+                worker.send({"cmd": "paced", "ticket": ticket})
+            except Exception:
+                pass # The worker is gone; the stream reports it
+        
+        compress = zstd_available()
+        if compress:
+            import zstandard
+            decompressor = zstandard.ZstdDecompressor()
+        
+        worker = self._idle.get()
+        finished = False
+        try:
+            if not worker.ping():
+                worker = self._replace(worker)
+            request = {"cmd": "fetch", "url": url, "automation": automation, "compress": compress}
+            for record in worker.stream(request, timeout):
+                if record.get("type") == "pace":
+                    # Off this thread, so pages captured meanwhile still stream through
+                    threading.Thread(target=grant, args=(worker, record["host"], record["ticket"]), daemon=True).start()
+                    continue
+                if record.get("encoding") == "zstd":
+                    packed = base64.b64decode(record["html"])
+                    record["html"] = decompressor.decompress(packed).decode("utf-8")
+                yield record
+            finished = True
+        finally:
+            # A worker that died, stalled, or is still mid-stream because the
+            # caller stopped reading cannot take the next job
+            if not finished:
+                worker = self._replace(worker)
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+
+_playwright_pool = None
+_playwright_pool_lock = threading.Lock()
+
+def get_playwright_pool(size: int = PLAYWRIGHT_POOL_SIZE) -> PlaywrightWorkerPool:
+    """One pool per process, shared across Streamlit reruns and sessions. `size` applies on first use."""
+    global _playwright_pool
+    with _playwright_pool_lock:
+        if _playwright_pool is None:
+            _playwright_pool = PlaywrightWorkerPool(size)
+        return _playwright_pool
+
+_host_scheduler = None
+_host_scheduler_lock = threading.Lock()
+
+def get_host_scheduler() -> HostScheduler:
+    """One politeness scheduler per process: static fetches and browser sessions share its per-host budgets."""
+    global _host_scheduler
+    with _host_scheduler_lock:
+        if _host_scheduler is None:
+            _host_scheduler = HostScheduler()
+        return _host_scheduler
+
+def emit(on_event, kind: str, payload):
+    """
+    Reports an engine event to the caller, if it listens. Kinds:
+    "warning" (message str), "debug_log" (list of Playwright log lines),
+    "revalidated" (URL whose cached copy a 304 confirmed) and "stored"
+    (page store bookkeeping, see fetch_url_content_stored).
+    """
+    if on_event:
+        on_event(kind, payload)
+
+def fetch_dynamic_content(url: str, automation: dict = None, on_page=None, on_event=None) -> tuple[list[str], list[dict]]:
+    """
+    Fetches content using Playwright via the warm worker pool.
+    Workers are subprocesses, which avoids threading conflicts with Streamlit.
+    Pages stream in as they are captured; on_page(index, html) is called for
+    each one while the worker keeps loading the next.
+    Returns a LIST of HTML strings and a LIST of captured API payloads.
+    """
+    # Prepare automation config
+    if automation is None:
+        automation = {"type": "single", "wait_time": 10}
+    
+    html_pages, json_payloads, debug_log = [], [], []
+    error = None
+    scheduler = get_host_scheduler()
+    host = host_of(url)
+    try:
+        # The browser session counts as one request in flight for its host; every
+        # further navigation asks this scheduler for a token, so browser sessions
+        # and static fetches share one budget per host
+        with scheduler.slot(host):
+            if ARCHIVE_ENABLED:
+                automation = dict(automation, archive=ARCHIVE_DIR) # The helper appends what it captures itself
+            for record in get_playwright_pool().fetch_stream(url, automation, pacer=scheduler.pace):
+                kind = record.get("type")
+                if kind == "page":
+                    html_pages.append(record["html"])
+                    if on_page:
+                        on_page(len(html_pages) - 1, record["html"])
+                elif kind == "payload":
+                    json_payloads.append({k: record[k] for k in ("url", "status", "data")})
+                elif kind == "log":
+                    debug_log.append(record["line"])
+                elif kind == "host_status":
+                    # Every answer the helper sees adapts the shared budget right away
+                    scheduler.report(record["host"], record.get("status"), record.get("retry_after"))
+                elif kind == "done":
+                    if not record.get("success"):
+                        error = record.get("error") or "Unknown error"
+    except TimeoutError:
+        raise Exception("Playwright fetch stalled for 2 minutes")
+    
+    # Hand over the debug log if present (readiness timings, pagination steps)
+    if debug_log:
+        emit(on_event, "debug_log", debug_log)
+    
+    if error:
+        raise Exception(error)
+    
+    return html_pages, json_payloads
+
+# ========== STATIC FETCH ENGINE (ASYNC) ==========
+
+STATIC_MAX_CONNECTIONS = 32      # Static requests in flight at once, across all hosts (per host: politeness.py)
+STATIC_TIMEOUT = 15              # Seconds, for connect and for each read
+# Same policy as the old Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+STATIC_RETRIES = 3
+STATIC_BACKOFF_FACTOR = 1
+STATIC_RETRY_STATUSES = {500, 502, 503, 504}
+RETRY_AFTER_STATUSES = {413, 429, 503} # Statuses whose Retry-After header is honoured
+
+StaticResponse = namedtuple("StaticResponse", ["url", "status", "headers", "text", "content"])
+
+class StaticFetchError(Exception):
+    """A static fetch failed for good (after retries); the message is user-facing."""
+
+def http_error(url: str, resp: StaticResponse) -> str:
+    """The user-facing error for a final 4xx/5xx response (requests' wording), or None."""
+    import httpx
+    
+    if resp.status in STATIC_RETRY_STATUSES:
+        return f"Max retries exceeded with url: {url} (too many {resp.status} error responses)"
+    if resp.status >= 400:
+        kind = "Client" if resp.status < 500 else "Server"
+        return f"{resp.status} {kind} Error: {httpx.codes.get_reason_phrase(resp.status)} for url: {resp.url}"
+    return None
+
+def http2_available() -> bool:
+    try:
+        import h2 # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def retry_delay(retry: int, retry_after: str = None) -> float:
+    """
+    Seconds to wait before retry number `retry` (1-based), like urllib3's Retry:
+    no wait before the first retry, then backoff_factor * 2**(retry - 1);
+    a Retry-After header wins.
+    """
+    pause = parse_retry_after(retry_after)
+    if pause is not None:
+        return pause
+    return 0.0 if retry <= 1 else min(120.0, STATIC_BACKOFF_FACTOR * 2 ** (retry - 1))
+
+class AsyncFetcher:
+    """
+    Static page fetching on one asyncio loop running in a background thread.
+    One long-lived httpx client per proxy keeps connections alive (HTTP/2 when
+    h2 is installed) across URLs and reruns. A semaphore caps the requests in
+    flight globally; the host scheduler paces and caps each host.
+    Sync callers (UI reruns, the CLI's URL threads) block on fetch(); their
+    requests still share the one loop, client pool and limits.
+    """
+    def __init__(self, max_connections: int = STATIC_MAX_CONNECTIONS, scheduler: HostScheduler = None):
+        import asyncio
+        import atexit
+        
+        self.scheduler = scheduler or get_host_scheduler()
+        self.loop = asyncio.new_event_loop()
+        self._limit = asyncio.Semaphore(max_connections)
+        self._clients = {} # proxy -> httpx.AsyncClient; only touched on the loop thread
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        atexit.register(self.close)
+
+    def _client(self, proxy: str = None):
+        import httpx
+        
+        client = self._clients.get(proxy)
+        if client is None:
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=STATIC_MAX_CONNECTIONS)
+            client = httpx.AsyncClient(
+                http2=http2_available(),
+                proxy=proxy,
+                limits=limits, # The semaphores do the limiting
+                timeout=httpx.Timeout(STATIC_TIMEOUT),
+                follow_redirects=True,
+            )
+            self._clients[proxy] = client
+        return client
+
+    async def fetch_async(self, url: str, proxy: str = None, headers: dict = None) -> StaticResponse:
+        """
+        GETs one URL with retries. Must run on self.loop. Raises StaticFetchError
+        when no answer came; 4xx/5xx answers are returned (see http_error).
+        """
+        import asyncio
+        import httpx
+        
+        host = host_of(url)
+        client = self._client(proxy)
+        retry = 0
+        while True:
+            # Host first: waiting on a slow host must not hold a global slot
+            async with self.scheduler.slot_async(host) as ticket, self._limit:
+                try:
+                    resp = await client.get(url, headers=headers or get_random_header())
+                    ticket.status, ticket.retry_after = resp.status_code, resp.headers.get("Retry-After")
+                    error = None
+                except (httpx.InvalidURL, httpx.UnsupportedProtocol) as e:
+                    raise StaticFetchError(str(e))
+                except httpx.TransportError as e: # Connect/read errors and timeouts are retried
+                    resp, error = None, f"{type(e).__name__}: {str(e) or 'no details'} ({url})"
+                except httpx.HTTPError as e: # Redirect loops, undecodable bodies: retrying will not help
+                    raise StaticFetchError(f"{type(e).__name__}: {str(e) or 'no details'} ({url})")
+            
+            if resp is not None and (resp.status_code not in STATIC_RETRY_STATUSES or retry >= STATIC_RETRIES):
+                break
+            if retry >= STATIC_RETRIES:
+                raise StaticFetchError(f"Max retries exceeded: {error}")
+            retry += 1
+            retry_after = resp.headers.get("Retry-After") if resp is not None and resp.status_code in RETRY_AFTER_STATUSES else None
+            await asyncio.sleep(retry_delay(retry, retry_after))
+        
+        return StaticResponse(str(resp.url), resp.status_code, resp.headers, resp.text, resp.content)
+
+    def fetch(self, url: str, proxy: str = None, headers: dict = None) -> StaticResponse:
+        """Blocking fetch of one URL. Raises StaticFetchError when no answer came."""
+        import asyncio
+        return asyncio.run_coroutine_threadsafe(self.fetch_async(url, proxy, headers), self.loop).result()
+
+    def close(self):
+        import asyncio
+        
+        async def close_clients():
+            for client in self._clients.values():
+                await client.aclose()
+            self._clients = {}
+        if self.loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(close_clients(), self.loop).result(timeout=5)
+            except Exception:
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+_static_fetcher = None
+_static_fetcher_lock = threading.Lock()
+
+def get_static_fetcher() -> AsyncFetcher:
+    """One fetcher (and connection pool) per process."""
+    global _static_fetcher
+    with _static_fetcher_lock:
+        if _static_fetcher is None:
+            _static_fetcher = AsyncFetcher()
+        return _static_fetcher
+
+# ========== HTTP REVALIDATION CACHE ==========
+
+CACHE_DIR = os.environ.get("CRAWLER_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "crawler")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """Cache key: lower-case scheme and host, no default port or fragment, sorted query."""
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+    
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+CachedPage = namedtuple("CachedPage", ["final_url", "etag", "last_modified", "content_type", "text"])
+
+class HttpCache:
+    """
+    Validators of static pages, keyed by normalized URL, next to the page
+    store's index; bodies are page store blobs. A refetch sends If-None-Match /
+    If-Modified-Since; a 304 means the stored body is still current, so only
+    headers cross the wire. Survives restarts.
+    """
+    def __init__(self, store: "PageStore" = None):
+        self.store = store or get_page_store()
+
+    def get(self, url: str) -> CachedPage:
+        with self.store.db() as db:
+            row = db.execute(
+                "SELECT final_url, etag, last_modified, content_type, body_hash FROM http_cache WHERE url = ?",
+                (normalize_url(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        text = self.store.get_text(row[4])
+        return CachedPage(*row[:4], text) if text is not None else None
+
+    def put(self, url: str, resp: "StaticResponse"):
+        """Stores a 200 answer if it can be revalidated later."""
+        etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        if not (etag or last_modified) or "no-store" in resp.headers.get("Cache-Control", "").lower():
+            return
+        body_hash = self.store.put_text(resp.text)
+        now = time.time()
+        with self.store.db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), resp.url, etag, last_modified, resp.headers.get("Content-Type", ""), body_hash, now, now)
+            )
+
+    def touch(self, url: str):
+        """Records a successful revalidation (304)."""
+        with self.store.db() as db:
+            db.execute("UPDATE http_cache SET validated_at = ? WHERE url = ?", (time.time(), normalize_url(url)))
+
+    @staticmethod
+    def validators(page: CachedPage) -> dict:
+        headers = {}
+        if page.etag:
+            headers["If-None-Match"] = page.etag
+        if page.last_modified:
+            headers["If-Modified-Since"] = page.last_modified
+        return headers
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+def get_http_cache() -> HttpCache:
+    global _http_cache
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HttpCache()
+        return _http_cache
+
+# ========== PAGE STORE ==========
+
+PAGE_STORE_TTL = 3600 # Seconds a stored fetch is served before fetching again
+
+StoredPage = namedtuple("StoredPage", ["fetch_id", "url", "index", "digest", "base_url"])
+StoredFetch = namedtuple("StoredFetch", ["fetch_id", "url", "fetched_at", "htmls", "final_url", "elapsed", "api_payloads", "debug_log"])
+
+def config_hash(use_proxy: str = None, force_dynamic: bool = False, automation: dict = None) -> str:
+    """Identifies how a page was fetched: the same URL under another configuration is another fetch."""
+    import hashlib
+    
+    key = json.dumps({"proxy": use_proxy, "dynamic": bool(force_dynamic), "automation": automation}, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def blob_path(blob_dir: str, digest: str, ext: str) -> str:
+    return os.path.join(blob_dir, digest[:2], digest + ext)
+
+def read_blob(blob_dir: str, digest: str) -> bytes:
+    """
+    A page store blob's bytes, or None if it is gone. A plain function, so pool
+    workers can read pages straight from disk instead of receiving them pickled.
+    """
+    path = blob_path(blob_dir, digest, ".zst")
+    if os.path.exists(path) and zstd_available():
+        import zstandard
+        with open(path, "rb") as f:
+            return zstandard.ZstdDecompressor().decompress(f.read())
+    path = blob_path(blob_dir, digest, ".zz")
+    if os.path.exists(path):
+        import zlib
+        with open(path, "rb") as f:
+            return zlib.decompress(f.read())
+    return None
+
+class PageStore:
+    """
+    Fetched pages on disk. Every HTML page (and payload list, debug log) is a
+    blob named by the SHA-256 of its content, compressed with zstd (zlib when
+    zstandard is missing), so identical pages are stored once. A SQLite index
+    maps (url, configuration hash, fetch time) to the blobs of each fetch.
+    """
+    def __init__(self, root: str = None):
+        import sqlite3
+        
+        self.root = root or os.path.join(CACHE_DIR, "pages")
+        self.blob_dir = os.path.join(self.root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.root, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL") # The UI and CLI runs may share the store
+        with self.db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS fetches (
+                    id INTEGER PRIMARY KEY, url TEXT, config_hash TEXT, fetched_at REAL,
+                    final_url TEXT, elapsed REAL, page_count INTEGER, payloads_hash TEXT, debug_log_hash TEXT
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS fetches_by_url ON fetches (url, config_hash, fetched_at)")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS fetch_pages (
+                    fetch_id INTEGER, idx INTEGER, hash TEXT, PRIMARY KEY (fetch_id, idx)
+                )""")
+            # Validators for conditional GETs (HttpCache)
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY, final_url TEXT, etag TEXT, last_modified TEXT,
+                    content_type TEXT, body_hash TEXT, fetched_at REAL, validated_at REAL
+                )""")
+
+    @contextmanager
+    def db(self):
+        """The shared connection, locked, committed on exit."""
+        with self._lock, self._conn:
+            yield self._conn
+
+    # --- Blobs ---
+
+    def _blob_path(self, digest: str, ext: str) -> str:
+        return blob_path(self.blob_dir, digest, ext)
+
+    def put_blob(self, data: bytes) -> str:
+        import hashlib
+        
+        digest = hashlib.sha256(data).hexdigest()
+        if zstd_available():
+            import zstandard
+            ext, packed = ".zst", None
+            if not os.path.exists(self._blob_path(digest, ext)):
+                packed = zstandard.ZstdCompressor(level=3).compress(data)
+        else:
+            import zlib
+            ext, packed = ".zz", None
+            if not os.path.exists(self._blob_path(digest, ext)):
+                packed = zlib.compress(data)
+        if packed is not None:
+            path = self._blob_path(digest, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(packed)
+            os.replace(tmp, path) # Atomic: readers never see half a blob
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        """The blob's bytes, or None if it is gone."""
+        return read_blob(self.blob_dir, digest)
+
+    def put_text(self, text: str) -> str:
+        return self.put_blob(text.encode("utf-8"))
+
+    def get_text(self, digest: str) -> str:
+        data = self.get_blob(digest)
+        return data.decode("utf-8") if data is not None else None
+
+    # --- Fetches ---
+
+    def save(self, url: str, cfg_hash: str, htmls: list[str], final_url: str, elapsed: float,
+             api_payloads: list[dict] = (), debug_log: list[str] = ()) -> int:
+        """Stores one fetch; returns its id."""
+        page_hashes = [self.put_text(h) for h in htmls]
+        payloads_hash = self.put_text(json.dumps(list(api_payloads))) if api_payloads else None
+        debug_log_hash = self.put_text("\n".join(debug_log)) if debug_log else None
+        with self.db() as db:
+            cur = db.execute(
+                "INSERT INTO fetches (url, config_hash, fetched_at, final_url, elapsed, page_count, payloads_hash, debug_log_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (normalize_url(url), cfg_hash, time.time(), final_url, elapsed, len(page_hashes), payloads_hash, debug_log_hash)
+            )
+            fetch_id = cur.lastrowid
+            db.executemany("INSERT INTO fetch_pages VALUES (?, ?, ?)", [(fetch_id, i, h) for i, h in enumerate(page_hashes)])
+        return fetch_id
+
+    def latest(self, url: str, cfg_hash: str, max_age: float = None) -> StoredFetch:
+        """The newest fetch of url under this configuration (no older than max_age seconds), or None."""
+        oldest = time.time() - max_age if max_age else 0
+        with self.db() as db:
+            row = db.execute(
+                "SELECT id FROM fetches WHERE url = ? AND config_hash = ? AND fetched_at >= ? ORDER BY fetched_at DESC LIMIT 1",
+                (normalize_url(url), cfg_hash, oldest)
+            ).fetchone()
+        return self.load(row[0]) if row else None
+
+    def load(self, fetch_id: int) -> StoredFetch:
+        """A stored fetch with its pages, or None if it (or one of its blobs) is gone."""
+        with self.db() as db:
+            row = db.execute(
+                "SELECT url, fetched_at, final_url, elapsed, payloads_hash, debug_log_hash FROM fetches WHERE id = ?", (fetch_id,)
+            ).fetchone()
+            hashes = [h for (h,) in db.execute("SELECT hash FROM fetch_pages WHERE fetch_id = ? ORDER BY idx", (fetch_id,))]
+        if row is None:
+            return None
+        url, fetched_at, final_url, elapsed, payloads_hash, debug_log_hash = row
+        htmls = [self.get_text(h) for h in hashes]
+        if any(h is None for h in htmls):
+            return None
+        api_payloads = json.loads(self.get_text(payloads_hash) or "[]") if payloads_hash else []
+        debug_log = (self.get_text(debug_log_hash) or "").split("\n") if debug_log_hash else []
+        return StoredFetch(fetch_id, url, fetched_at, htmls, final_url, elapsed, api_payloads, debug_log)
+
+    def stored_pages(self, url_contains: str = None, since: float = None, latest_only: bool = True) -> list["StoredPage"]:
+        """
+        Pages of the stored fetches whose URL contains url_contains, fetched at or
+        after `since` (epoch seconds). latest_only keeps one fetch per URL and configuration.
+        """
+        query = (
+            "SELECT f.id, f.url, p.idx, p.hash, f.final_url FROM fetches f JOIN fetch_pages p ON p.fetch_id = f.id "
+            "WHERE f.url LIKE ? ESCAPE '\\' AND f.fetched_at >= ?"
+        )
+        if latest_only:
+            query += " AND f.id IN (SELECT MAX(id) FROM fetches GROUP BY url, config_hash)"
+        pattern = "%" + (url_contains or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self.db() as db:
+            rows = db.execute(query + " ORDER BY f.id, p.idx", (pattern, since or 0)).fetchall()
+        return [StoredPage(*row) for row in rows]
+
+    def payloads(self, fetch_id: int) -> list[dict]:
+        """The API payloads captured with a stored fetch."""
+        with self.db() as db:
+            row = db.execute("SELECT payloads_hash FROM fetches WHERE id = ?", (fetch_id,)).fetchone()
+        if not row or not row[0]:
+            return []
+        return json.loads(self.get_text(row[0]) or "[]")
+
+    def clear(self):
+        """Forgets every stored fetch and HTTP cache entry and deletes their blobs."""
+        import shutil
+        
+        with self.db() as db:
+            db.execute("DELETE FROM fetch_pages")
+            db.execute("DELETE FROM fetches")
+            db.execute("DELETE FROM http_cache")
+            shutil.rmtree(self.blob_dir, ignore_errors=True)
+            os.makedirs(self.blob_dir, exist_ok=True)
+
+_page_store = None
+_page_store_lock = threading.Lock()
+
+def get_page_store() -> PageStore:
+    global _page_store
+    with _page_store_lock:
+        if _page_store is None:
+            _page_store = PageStore()
+        return _page_store
+
+# ========== RESPONSE ARCHIVE ==========
+
+ARCHIVE_DIR = os.path.join(CACHE_DIR, "archive")
+ARCHIVE_ENABLED = os.environ.get("CRAWLER_ARCHIVE", "1") != "0" # CRAWLER_ARCHIVE=0 turns it off
+
+def get_archive() -> Archive:
+    """The process's WARC-style response archive (see archive.py), or None when turned off."""
+    return open_archive(ARCHIVE_DIR) if ARCHIVE_ENABLED else None
+
+def archive_response(resp: StaticResponse, on_event=None):
+    """Appends a static response to the archive; a full disk warns instead of failing the fetch."""
+    archive = get_archive()
+    if archive is None:
+        return
+    try:
+        archive.append(resp.url, resp.content, resp.headers.get("Content-Type", ""), resp.status, resp.headers)
+    except Exception as e:
+        emit(on_event, "warning", f"Could not archive {resp.url}: {str(e)}")
+
+# ========== FETCH ENGINE ==========
+
+def fetch_url_content(url: str, use_proxy: str = None, force_dynamic: bool = False, automation: dict = None, on_page=None, on_event=None):
+    """
+    Returns (htmls, final_url, elapsed, api_payloads), or (None, error, 0, []).
+    on_page(index, html, base_url) is called as each browser page arrives.
+    """
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+    
+    # Force dynamic if automation is requested
+    if force_dynamic or automation:
+        if use_proxy:
+             emit(on_event, "warning", "Proxies are ignored for Playwright fetching in this basic setup.")
+        
+        try:
+            start_time = time.time()
+            # Returns LIST of htmls plus any captured API payloads
+            page_callback = (lambda i, h: on_page(i, h, url)) if on_page else None
+            htmls, api_payloads = fetch_dynamic_content(url, automation, page_callback, on_event)
+            elapsed = round(time.time() - start_time, 2)
+            return htmls, url, elapsed, api_payloads
+        except Exception as e:
+            return None, f"Playwright Fetch Failed: {str(e)}", 0, []
+            
+    # --- Static sites: shared pooled async client, revalidated against the HTTP cache ---
+    try:
+        start_time = time.time()
+        cache = get_http_cache()
+        cached = cache.get(url)
+        headers = get_random_header()
+        if cached:
+            headers.update(cache.validators(cached))
+        resp = get_static_fetcher().fetch(url, proxy=use_proxy, headers=headers)
+        
+        if resp.status == 304 and cached:
+            cache.touch(url)
+            emit(on_event, "revalidated", url)
+            elapsed = round(time.time() - start_time, 2)
+            return [cached.text], cached.final_url, elapsed, []
+        
+        # Error pages are archived too: what the server answered is part of the record
+        archive_response(resp, on_event)
+        error = http_error(url, resp)
+        if error:
+            return None, error, 0, []
+        
+        # Check content type
+        ctype = resp.headers.get("Content-Type", "").lower()
+        if "text/html" not in ctype:
+            return None, f"Skipped: Content-Type is {ctype}, not HTML.", 0, []
+        
+        cache.put(url, resp)
+        elapsed = round(time.time() - start_time, 2)
+        return [resp.text], resp.url, elapsed, [] # Return list for consistency
+        
+    except StaticFetchError as e:
+        return None, str(e), 0, []
+
+def fetch_url_content_stored(url: str, use_proxy: str = None, force_dynamic: bool = False, automation: dict = None,
+                             on_page=None, on_event=None, max_age: float = PAGE_STORE_TTL):
+    """
+    fetch_url_content through the page store. A stored fetch of the same URL and
+    configuration, no older than max_age seconds (0: always fetch), is served from
+    disk without any network; fresh fetches are stored. Either way a "stored" event
+    carries {"fetch_id", "fetched_at", "hit"}.
+    """
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+    store = get_page_store()
+    cfg_hash = config_hash(use_proxy, force_dynamic, automation)
+    
+    if max_age:
+        hit = store.latest(url, cfg_hash, max_age)
+        if hit:
+            if hit.debug_log:
+                emit(on_event, "debug_log", hit.debug_log)
+            emit(on_event, "stored", {"fetch_id": hit.fetch_id, "fetched_at": hit.fetched_at, "hit": True})
+            return hit.htmls, hit.final_url, hit.elapsed, hit.api_payloads
+    
+    debug_log = []
+    def capture(kind, payload):
+        if kind == "debug_log":
+            debug_log.extend(payload)
+        emit(on_event, kind, payload)
+    
+    htmls, final_url, elapsed, api_payloads = fetch_url_content(url, use_proxy, force_dynamic, automation, on_page, capture)
+    if htmls is not None:
+        fetch_id = store.save(url, cfg_hash, htmls, final_url, elapsed, api_payloads, debug_log)
+        emit(on_event, "stored", {"fetch_id": fetch_id, "fetched_at": time.time(), "hit": False})
+    return htmls, final_url, elapsed, api_payloads
+
+# ========== EXTRACTORS ==========
+
+# Text nodes BeautifulSoup's get_text() would return (it skips script/style/template and comments)
+PAGE_STRINGS = etree.XPath(
+    "//text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False
+)
+# Same, minus the tags we never treat as visible text
+VISIBLE_STRINGS = etree.XPath(
+    "//text()[not(ancestor::script or ancestor::style or ancestor::template or ancestor::noscript or ancestor::svg)]",
+    smart_strings=False
+)
+ANCHORS_WITH_HREF = etree.XPath("//a[@href]")
+
+SOCIAL_DOMAINS = [
+    "facebook.com", "instagram.com", "linkedin.com", "twitter.com", "x.com",
+    "tiktok.com", "youtube.com", "t.me", "wa.me", "github.com", "medium.com"
+]
+
+@lru_cache(maxsize=32)
+def build_social_index(extra_domains: tuple = ()) -> dict:
+    """
+    Hostname -> platform table. Extra entries are "domain" or "domain=Label",
+    e.g. ("threads.net=Threads", "bsky.app=Bluesky").
+    """
+    index = {d: d.split('.')[0].capitalize() for d in SOCIAL_DOMAINS}
+    for entry in extra_domains:
+        domain, _, label = entry.partition("=")
+        domain = domain.strip().lower()
+        if domain:
+            index[domain] = label.strip() or domain.split('.')[0].capitalize()
+    return index
+
+def lookup_social_platform(host: str, index: dict):
+    """Finds the platform by host suffix: m.facebook.com -> facebook.com. Never matches a bare TLD."""
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        platform = index.get(".".join(labels[i:]))
+        if platform:
+            return platform
+    return None
+
+# One <a href> of a page, resolved once and shared by every link-based extractor
+Anchor = namedtuple("Anchor", [
+    "element",      # the lxml element
+    "raw_href",     # href exactly as written
+    "href",         # stripped href
+    "url",          # absolute URL
+    "scheme",       # "https", "mailto", "tel", ...
+    "host",         # lowercased hostname, no port
+    "netloc",       # lowercased netloc
+    "text",         # cleaned link text
+    "is_internal",  # host belongs to the page's domain
+])
+
+COMPANY_IGNORE_LIST = {"home", "about", "contact", "services", "blog", "news", "careers", "privacy", "terms", "login", "sign up", "read more"}
+
+# --- ENHANCED SUFFIX LIST ---
+COMPANY_SUFFIXES = [
+    # Common Global/US
+    "inc", "corp", "group", "holdings", "ventures", "capital", "labs", 
+    "partners", "company", "co", 
+    
+    # Limited/Private/Public Companies
+    "limited", "ltd", "private", "public", "plc", "p.l.c.", "pty", 
+    "pte ltd", # Singapore specific
+    
+    # LLCs and equivalent
+    "llc", "l.l.c.", "l.p.", "l.p", "llp", "l.l.p.",
+    
+    # Partnerships/Sole Proprietorships
+    "partnership", "associates", "sarl", "sa", "ag", "gmbh",
+    
+    # Other common identifiers (often used at the end of a name)
+    "consulting", "solutions", "technology", "digital" 
+]
+
+def _compile_company_suffix_pattern(suffixes):
+    """
+    One alternation for every suffix, plus variants without periods:
+    whitespace, the suffix, an optional trailing '.' or space, end of string.
+    """
+    variants = set(suffixes)
+    for s in suffixes:
+        if "." in s:
+            variants.add(s.replace('.', ''))
+    # Longest first so the alternation tries the most specific suffix first
+    alternation = "|".join(re.escape(s) for s in sorted(variants, key=len, reverse=True))
+    tail = max(len(s) for s in variants) + 2 # whitespace + suffix + optional '.'/space
+    return re.compile(r'\s(?:' + alternation + r')[.\s]?$'), tail
+
+COMPANY_SUFFIX_PATTERN, COMPANY_SUFFIX_TAIL = _compile_company_suffix_pattern(COMPANY_SUFFIXES)
+
+def parse_html(html: str):
+    """Parses a page once into an lxml document rooted at <html>."""
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:
+        # Unicode input with an XML encoding declaration: hand lxml bytes instead
+        return lxml_html.document_fromstring(html.encode("utf-8"), parser=lxml_html.HTMLParser(encoding="utf-8"))
+    except etree.ParserError:
+        return lxml_html.document_fromstring("<html></html>")
+
+@lru_cache(maxsize=1)
+def css_translator():
+    from cssselect import HTMLTranslator # CSS -> XPath for lxml
+    return HTMLTranslator()
+
+@lru_cache(maxsize=512)
+def compile_css(selector: str, relative: bool = False) -> etree.XPath:
+    """
+    Translates a CSS selector to compiled XPath. Relative selectors only match
+    descendants (like BeautifulSoup's select on a tag); otherwise the context
+    node itself may match too.
+    """
+    prefix = "descendant::" if relative else "descendant-or-self::"
+    return etree.XPath(css_translator().css_to_xpath(selector, prefix=prefix))
+
+def element_text(el) -> str:
+    return el.text_content()
+
+# ---- Tables (same rules as pandas.read_html, without re-serializing the page) ----
+
+TABLE_NA_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+                   "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+# read_html's thousands rule (pandas' python parser): "," is only dropped from values shaped like numbers
+TABLE_THOUSANDS = re.compile(r"^[\-\+]?([0-9]+,|[0-9])*(\.[0-9]*)?([0-9]?(E|e)\-?[0-9]+)?$")
+
+def _is_hidden(el) -> bool:
+    return "display:none" in (el.get("style") or "").replace(" ", "").lower()
+
+def _span(cell, attr: str) -> int:
+    try:
+        return max(int(cell.get(attr) or 1), 1)
+    except ValueError:
+        return 1
+
+def _table_rows(table):
+    """Splits a table's own rows (not nested tables') into header, body and footer."""
+    head, body, foot = [], [], []
+    for child in table:
+        if child.tag == "thead":
+            head.extend(child.iterchildren("tr"))
+        elif child.tag == "tbody":
+            body.extend(child.iterchildren("tr"))
+        elif child.tag == "tfoot":
+            foot.extend(child.iterchildren("tr"))
+        elif child.tag == "tr":
+            body.append(child)
+    head, body, foot = ([tr for tr in rows if not _is_hidden(tr)] for rows in (head, body, foot))
+    
+    # Without <thead>, leading rows made only of <th> are the header
+    if not head:
+        while body and all(c.tag == "th" for c in body[0].iterchildren("td", "th")):
+            head.append(body.pop(0))
+    return head, body, foot
+
+def _cell_text(cell) -> str:
+    """A cell's text with every <br> read as a line break, like read_html (the shared tree is left untouched)."""
+    if cell.find(".//br") is None:
+        return element_text(cell)
+    parts = []
+    def walk(el):
+        if el.tag == "br":
+            parts.append("\n")
+        elif isinstance(el.tag, str) and el.text: # Comments' text is not page text
+            parts.append(el.text)
+        for child in el:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+    walk(cell)
+    return "".join(parts)
+
+def _expand_spans(rows) -> list[list[str]]:
+    """Cell texts per row with colspan/rowspan cells repeated into every slot they cover."""
+    all_texts = []
+    remainder = [] # (column, text, rows left) carried down from earlier rowspans
+    for tr in rows:
+        texts, next_remainder = [], []
+        index = 0
+        for cell in tr.iterchildren("td", "th"):
+            if _is_hidden(cell):
+                continue
+            while remainder and remainder[0][0] <= index:
+                prev_index, prev_text, prev_rows = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rows > 1:
+                    next_remainder.append((prev_index, prev_text, prev_rows - 1))
+                index += 1
+            text = clean_text(_cell_text(cell))
+            rowspan, colspan = _span(cell, "rowspan"), _span(cell, "colspan")
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+        for prev_index, prev_text, prev_rows in remainder:
+            texts.append(prev_text)
+            if prev_rows > 1:
+                next_remainder.append((prev_index, prev_text, prev_rows - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+    # Rows that only exist because a rowspan ran past the last <tr>
+    while remainder:
+        texts, next_remainder = [], []
+        for prev_index, prev_text, prev_rows in remainder:
+            texts.append(prev_text)
+            if prev_rows > 1:
+                next_remainder.append((prev_index, prev_text, prev_rows - 1))
+        all_texts.append(texts)
+        remainder = next_remainder
+    return all_texts
+
+TABLE_BOOL_VALUES = {"True": True, "TRUE": True, "true": True, "False": False, "FALSE": False, "false": False}
+
+def _column_values(values: list):
+    """Numbers become numbers (thousands separators allowed), True/False become bools, NA markers become NaN."""
+    import pandas as pd
+    
+    cleaned = [None if v is None or v in TABLE_NA_VALUES else v for v in values]
+    cleaned = [v.replace(",", "") if v is not None and "," in v and TABLE_THOUSANDS.search(v) else v for v in cleaned]
+    present = [v for v in cleaned if v is not None]
+    if not present:
+        return pd.Series([float("nan")] * len(cleaned), dtype="float64")
+    if all(v in TABLE_BOOL_VALUES for v in present):
+        # Like read_html: bool, or object with NaN holes
+        flags = [float("nan") if v is None else TABLE_BOOL_VALUES[v] for v in cleaned]
+        return pd.Series(flags, dtype=bool if len(present) == len(cleaned) else object)
+    try:
+        return pd.to_numeric(pd.Series(cleaned, dtype=object))
+    except (ValueError, TypeError):
+        return pd.Series(cleaned) # Let pandas pick its text dtype
+
+def _header_names(header_rows: list[list[str]], width: int):
+    """Column labels: names from a single header row, a MultiIndex for several, duplicates get .1, .2."""
+    import pandas as pd
+    
+    if not header_rows:
+        return pd.RangeIndex(width)
+    levels = []
+    for level, row in enumerate(header_rows):
+        row = row + [""] * (width - len(row))
+        names = []
+        for i, name in enumerate(row):
+            if name == "":
+                name = f"Unnamed: {i}" if len(header_rows) == 1 else f"Unnamed: {i}_level_{level}"
+            names.append(name)
+        levels.append(names)
+    if len(levels) == 1:
+        seen = Counter()
+        unique = []
+        for name in levels[0]:
+            unique.append(f"{name}.{seen[name]}" if seen[name] else name)
+            seen[name] += 1
+        return unique
+    return pd.MultiIndex.from_arrays(levels)
+
+def table_to_frame(table):
+    """Builds a DataFrame column by column from one parsed <table>, or None if it has no data."""
+    import pandas as pd
+    
+    head, body, foot = _table_rows(table)
+    header_rows = _expand_spans(head)
+    data_rows = _expand_spans(body) + _expand_spans(foot)
+    named = [i for i, row in enumerate(header_rows) if any(row)]
+    if len(header_rows) > 1 and named:
+        # Like read_html: all-empty header rows are skipped, or read as data below the last named one
+        data_rows = header_rows[named[-1] + 1:] + data_rows
+        header_rows = [header_rows[i] for i in named]
+    if not data_rows and not header_rows:
+        return None
+    width = max(len(r) for r in header_rows + data_rows)
+    if width == 0:
+        return None
+    if width == 1:
+        # read_html's parser skips blank lines, and a one-column line is blank when its cell is
+        data_rows = [row for row in data_rows if row and row[0].strip()]
+    columns = [_column_values([row[i] if i < len(row) else None for row in data_rows]) for i in range(width)]
+    df = pd.concat(columns, axis=1) if data_rows else pd.DataFrame(index=pd.RangeIndex(0), columns=range(width))
+    df.columns = _header_names(header_rows, width)
+    return df
+
+def memoized(method):
+    """Caches an extractor method's result on the instance, keyed by its arguments."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in self._memo:
+            self._memo[key] = method(self, *args, **kwargs)
+        return self._memo[key]
+    return wrapper
+
+class Extractor:
+    """
+    Runs the extractors over one page. Nothing is parsed until first needed,
+    and each get_* result is computed once per instance; treat results as read-only.
+    """
+    def __init__(self, html: str, base_url: str):
+        self.html = html
+        self.base_url = base_url
+        self.base_domain = urlparse(base_url).netloc.lower()
+        self._memo = {}
+
+    @cached_property
+    def tree(self):
+        # One parse: CSS, XPath, visible text and every get_* method share this tree
+        return parse_html(self.html)
+
+    @cached_property
+    def anchors(self):
+        """The page's anchor index: one pass over <a href>, shared by all link extractors."""
+        anchors = []
+        for a in ANCHORS_WITH_HREF(self.tree):
+            raw_href = a.get("href")
+            href = raw_href.strip()
+            try:
+                abs_url = urljoin(self.base_url, href)
+                parsed = urlparse(abs_url)
+                scheme, host, netloc = parsed.scheme, parsed.hostname or "", parsed.netloc.lower()
+            except ValueError: # e.g. a malformed IPv6 host
+                abs_url, scheme, host, netloc = href, "", "", ""
+            anchors.append(Anchor(
+                element=a,
+                raw_href=raw_href,
+                href=href,
+                url=abs_url,
+                scheme=scheme,
+                host=host,
+                netloc=netloc,
+                text=clean_text(element_text(a)),
+                is_internal=self.base_domain in netloc,
+            ))
+        return anchors
+
+    @cached_property
+    def visible_text(self):
+        # Script/style/noscript/svg text is skipped rather than stripped from a copy
+        return clean_text(" ".join(VISIBLE_STRINGS(self.tree)))
+
+    def _meta_content(self, **attrs):
+        """content= of the first <meta> whose attributes match exactly, else ""."""
+        for meta in self.tree.iter("meta"):
+            if all(meta.get(k) == v for k, v in attrs.items()):
+                return meta.get("content", "")
+        return ""
+
+    @memoized
+    def get_metadata(self):
+        """Extract SEO metadata."""
+        title = self.tree.find(".//title")
+        return [{
+            "Title": (title.text or "").strip() if title is not None else "",
+            "Description": self._meta_content(name="description"),
+            "Keywords": self._meta_content(name="keywords"),
+            "Generator": self._meta_content(name="generator"),
+        }]
+
+    @memoized
+    def get_phones(self):
+        """Optimized Phone Extraction."""
+        candidates = set()
+        
+        # 1. Regex for labeled numbers (High Confidence)
+        label_pattern = re.compile(
+            r"(?i)(tel|phone|mobile|call|contact|fax)\s*[:\.]?\s*(\+?[\d\(\)\-\s]{8,})"
+        )
+        for m in label_pattern.finditer(self.visible_text):
+            raw = m.group(2).strip()
+            if len(re.sub(r"\D", "", raw)) >= 8:
+                candidates.add(raw)
+
+        # 2. Href tel: links (High Confidence)
+        for anchor in self.anchors:
+            if anchor.raw_href.startswith("tel:"):
+                candidates.add(anchor.raw_href.replace("tel:", ""))
+
+        # 3. Generic fallback (Lower Confidence - Filtered)
+        generic_pattern = re.compile(r"\+?\d[\d\s\-\(\)]{9,}\d")
+        for m in generic_pattern.finditer(self.visible_text):
+            raw = m.group(0).strip()
+            digits = re.sub(r"\D", "", raw)
+            # Filter out years (2020-2025) and short nums
+            if len(digits) > 7 and not re.match(r"^(19|20)\d{2}$", digits):
+                candidates.add(raw)
+
+        return [{"Phone": p} for p in sorted(candidates)]
+
+    @memoized
+    def get_emails(self):
+        """Extract emails via regex and mailto links."""
+        pattern = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
+        text_emails = set(re.findall(pattern, self.visible_text))
+        
+        # Add mailto links (sometimes obfuscated in text but clear in link)
+        for anchor in self.anchors:
+            if anchor.raw_href.startswith("mailto:"):
+                email = anchor.raw_href.replace("mailto:", "").split("?")[0]
+                text_emails.add(email)
+                
+        return [{"Email": e} for e in sorted(text_emails)]
+
+    @memoized
+    def get_socials(self, extra_domains: tuple = ()):
+        """Extract social media profiles, classified by the link's hostname."""
+        index = build_social_index(tuple(extra_domains))
+        found = []
+        seen = set()
+        
+        for anchor in self.anchors:
+            platform = lookup_social_platform(anchor.host, index)
+            if platform and anchor.url not in seen:
+                seen.add(anchor.url)
+                found.append({"Platform": platform, "URL": anchor.url})
+        return found
+
+    @memoized
+    def get_links(self):
+        """Extract all internal/external links."""
+        links = []
+        seen = set()
+        for anchor in self.anchors:
+            if not anchor.href or anchor.href.startswith(("#", "javascript:")): 
+                continue
+            if anchor.url in seen: continue
+            seen.add(anchor.url)
+            
+            links.append({
+                "Text": anchor.text,
+                "URL": anchor.url,
+                "Type": "Internal" if anchor.is_internal else "External"
+            })
+        return links
+
+    @memoized
+    def get_images(self):
+        """Extract images with alt text."""
+        images = []
+        seen = set()
+        for img in self.tree.iter("img"):
+            if img.get("src") is None: continue
+            src = urljoin(self.base_url, img.get("src"))
+            if src in seen: continue
+            seen.add(src)
+            images.append({
+                "Source": src,
+                "Alt Text": clean_text(img.get("alt") or ""),
+            })
+        return images
+
+    @memoized
+    def get_addresses(self):
+        """Heuristic address extraction focusing on Zip/Postal codes."""
+        candidates = []
+        # Look for patterns like "Singapore 123456" or "NY 10001" or "London SW1A"
+        # This is a general regex for common address endings
+        postal_patterns = [
+            r"(?i)Singapore\s+(\d{6})",
+            r"\b[A-Z]{2}\s+\d{5}(-\d{4})?\b", # US Zip
+            r"\b(Street|St\.|Road|Rd\.|Avenue|Ave\.|Lane|Ln\.|Boulevard|Blvd\.|Drive|Dr\.)" 
+        ]
+        
+        lines = self.visible_text.split('\n')
+        for line in lines:
+            line = line.strip()
+            if len(line) > 100 or len(line) < 10: continue
+            
+            # If line matches a postal code pattern OR contains explicit address keywords
+            if any(re.search(p, line) for p in postal_patterns):
+                candidates.append({"Address Candidate": line})
+                
+        return candidates
+
+    @memoized
+    def get_company_names(self):
+        """
+        Improved heuristic for company names, looking for suffixes common 
+        to various business structures globally.
+        """
+        potential_names = set()
+        
+        # 1. Check Meta Site Name
+        og_name = self._meta_content(property="og:site_name")
+        if og_name:
+            potential_names.add(og_name.strip())
+
+        # 2. Check text for Suffixes
+        for text in PAGE_STRINGS(self.tree):
+            text = text.strip()
+            if not text: continue
+            clean = clean_text(text)
+            if 3 < len(clean) < 80: # Increased max length slightly for long names
+                lower = clean.lower()
+                if lower in COMPANY_IGNORE_LIST: continue
+                
+                # Check if it ends with a company suffix, ensuring it's a word boundary.
+                # Any match lies within the last few characters, so only those are searched.
+                if COMPANY_SUFFIX_PATTERN.search(lower[-COMPANY_SUFFIX_TAIL:]):
+                    potential_names.add(clean)
+
+        return [{"Company Name": name} for name in sorted(potential_names)]
+
+    @memoized
+    def get_tables(self):
+        """Extracts HTML tables into list of DataFrames, straight from the parsed tree."""
+        tables = []
+        for table in self.tree.iter("table"):
+            if _is_hidden(table):
+                continue
+            df = table_to_frame(table)
+            if df is not None:
+                tables.append(df)
+        return tables
+
+    @memoized
+    def get_portfolio_blocks(self):
+        """
+        Specific logic for 'Award/Portfolio' style blocks. 
+        Looks for patterns: Heading (Award) -> Link (Company) -> Text (Country/Desc)
+        """
+        # Find all external web links that might be companies
+        candidates = []
+        for anchor in self.anchors:
+            if anchor.is_internal: continue # Skip internal
+            if anchor.scheme not in ("http", "https"): continue # mailto:, tel:, javascript:
+            
+            # If the link text is short and capitalized, it might be a company name
+            if not anchor.text or len(anchor.text) > 50: continue
+            candidates.append(anchor)
+        
+        # Heuristic: Grab the paragraph following the link.
+        # One pass in document order: every <p> answers all links seen since the previous <p>
+        # (the link's own descendants come right after it, so a <p> inside the link counts too).
+        waiting_for_p = {anchor.element for anchor in candidates}
+        pending, next_p_text = [], {}
+        for el in self.tree.iter():
+            if el.tag == "p":
+                if pending:
+                    text = clean_text(element_text(el))
+                    for a in pending:
+                        next_p_text[a] = text
+                    pending = []
+            elif el in waiting_for_p:
+                pending.append(el)
+        
+        results = []
+        for anchor in candidates:
+            desc = next_p_text.get(anchor.element, "")
+            if len(desc) > 10: # Only if meaningful description exists
+                results.append({
+                    "Company Name": anchor.text,
+                    "URL": anchor.url,
+                    "Description Snippet": desc[:200] + "..."
+                })
+        return results
+    
+    # --- CUSTOM EXTRACTION METHODS ---
+
+    @memoized
+    def extract_custom_data_blocks(self, container_selector, relative_map_json, attr="text", selector_type="CSS"):
+        """
+        Extracts structured data blocks using standard selectors or 
+        robust Python logic for header-based lookups.
+        The selectors are compiled once per configuration and reused for every page.
+        """
+        return compile_extraction_plan(container_selector, relative_map_json, attr, selector_type).run(self)
+
+
+# ========== CUSTOM EXTRACTION PLAN ==========
+
+DESCENDANT_TEXT = etree.XPath(".//text()") # Smart strings: we need getparent()/is_tail
+HEADER_CELL = etree.XPath("descendant::div[contains(@class, 'entity__field_header') and contains(string(.), $header)][1]")
+
+def element_value(el, attr, base_url):
+    """Helper to safely retrieve the attribute or text value."""
+    if attr == "text":
+        return clean_text(element_text(el))
+    elif attr == "href":
+        return urljoin(base_url, el.get("href", ""))
+    elif attr == "src":
+        return urljoin(base_url, el.get("src", ""))
+    else:
+        return el.get(attr, "")
+
+def sibling_value_by_header(container, header_text, value_class):
+    """
+    Finds a header element by its text content and returns the text 
+    of its adjacent sibling with a specific class.
+    """
+    header_el = HEADER_CELL(container, header=header_text)
+    if header_el:
+        # The value is the next sibling that has the specified class
+        for value_el in header_el[0].itersiblings("div"):
+            if any(value_class in c for c in value_el.get("class", "").split()):
+                return clean_text(element_text(value_el))
+    return None
+
+def sibling_value_by_text_match(container, label_text, sibling_tag):
+    """
+    Finds an element containing specific text, then finds its next sibling of a certain tag.
+    """
+    # Find the text node containing the text
+    # This is more precise than searching for tags containing the text
+    for target_string in DESCENDANT_TEXT(container):
+        if label_text not in target_string:
+            continue
+        # A tail string hangs off its previous sibling; its real parent is one level up
+        target_tag = target_string.getparent()
+        if target_string.is_tail:
+            target_tag = target_tag.getparent()
+        # Try to find next sibling of the tag containing the text
+        sibling = next(target_tag.itersiblings(sibling_tag), None)
+        if sibling is not None:
+            return clean_text(element_text(sibling))
+        return None
+    return None
+
+def _constant(value):
+    return lambda container, base_url: value
+
+class ExtractionPlan:
+    """
+    A custom extraction compiled once: the container selector and every
+    relative selector become compiled XPath objects (CSS is translated up
+    front, TEXT_MATCH labels are XPath variables), so running the plan over
+    many pages and containers does no string or selector work per row.
+    """
+    def __init__(self, container_selector, relative_map_json, attr="text", selector_type="CSS"):
+        self.container_selector = container_selector
+        self.selector_type = selector_type
+        self.error = None       # Reported instead of any rows
+        self.field_error = None # Reported once some container matched
+        self.fields = []        # (column name, extract(container, base_url) -> value or None)
+        
+        try:
+            relative_map = json.loads(relative_map_json)
+        except json.JSONDecodeError:
+            self.error = "Invalid JSON format in Relative Selectors."
+            return
+        
+        # --- CONTAINER SELECTION ---
+        try:
+            if selector_type == "XPath":
+                self.container_xpath = etree.XPath(container_selector)
+            else:
+                self.container_xpath = compile_css(container_selector)
+        except Exception as e:
+            self.error = f"Invalid XPath: {str(e)}" if selector_type == "XPath" else f"Extraction failed: {str(e)}"
+            return
+        
+        try:
+            for col_name, rel_selector in relative_map.items():
+                self.fields.append((col_name, self._compile_field(rel_selector, attr, selector_type)))
+        except Exception as e:
+            self.field_error = f"Extraction failed: {str(e)}"
+
+    @staticmethod
+    def _compile_field(rel_selector, attr, selector_type):
+        # --- 1. HEADER LOOKUP ---
+        if rel_selector.startswith("HEADER:"):
+            # Format: "HEADER:Header Text|Value Class"
+            # Note: Only works with CSS containers for now
+            if selector_type == "XPath":
+                return _constant("HEADER: not supported with XPath containers yet")
+            try:
+                _, definition = rel_selector.split(":", 1)
+                header_text, value_class = definition.split("|")
+            except ValueError:
+                return _constant("ERROR: Malformed HEADER selector")
+            header_text, value_class = header_text.strip(), value_class.strip()
+            return lambda container, base_url: sibling_value_by_header(container, header_text, value_class)
+        
+        # --- 2. TEXT MATCH LOOKUP ---
+        if rel_selector.startswith("TEXT_MATCH:"):
+            # Format: "TEXT_MATCH:Label Text|Sibling Tag"
+            # Example: "TEXT_MATCH:Date Incorporated:|span"
+            if selector_type == "XPath":
+                try:
+                    _, definition = rel_selector.split(":", 1)
+                    label_text, sibling_tag = definition.split("|")
+                    # Element containing the label, then its following sibling; the label is a variable
+                    query = etree.XPath(f".//*[contains(text(), $label)]/following-sibling::{sibling_tag.strip()}[1]")
+                except Exception as e:
+                    return _constant(f"XPath Error: {str(e)}")
+                label_text = label_text.strip()
+                
+                def text_match_xpath(container, base_url):
+                    try:
+                        sub_el = query(container, label=label_text)
+                    except Exception as e:
+                        return f"XPath Error: {str(e)}"
+                    return sub_el[0].text_content().strip() if sub_el else None
+                return text_match_xpath
+            
+            try:
+                _, definition = rel_selector.split(":", 1)
+                label_text, sibling_tag = definition.split("|")
+            except ValueError:
+                return _constant("ERROR: Malformed TEXT_MATCH selector")
+            label_text, sibling_tag = label_text.strip(), sibling_tag.strip()
+            return lambda container, base_url: sibling_value_by_text_match(container, label_text, sibling_tag)
+        
+        # --- 3. STANDARD SELECTOR (CSS or XPath) ---
+        if selector_type == "XPath":
+            # Relative XPath starts with .
+            if not rel_selector.startswith("."):
+                rel_selector = "." + rel_selector
+            try:
+                query = etree.XPath(rel_selector)
+            except Exception:
+                return _constant(None) # Reported as MISSING, like a failed lookup
+            
+            def standard_xpath(container, base_url):
+                try:
+                    result = query(container)
+                except Exception:
+                    return None
+                # string()/count() style expressions return a scalar
+                if isinstance(result, (str, float, bool)):
+                    return result.strip() if isinstance(result, str) else result
+                if not result:
+                    return None
+                # Handle if result is string (attribute) or element
+                item = result[0]
+                return item.strip() if isinstance(item, str) else item.text_content().strip()
+            return standard_xpath
+        
+        query = compile_css(rel_selector, relative=True)
+        
+        def standard_css(container, base_url):
+            field_elements = query(container)
+            return element_value(field_elements[0], attr, base_url) if field_elements else None
+        return standard_css
+
+    def run(self, extractor) -> list[dict]:
+        if self.error:
+            return [{"Error": self.error}]
+        try:
+            container_elements = self.container_xpath(extractor.tree)
+        except Exception as e:
+            return [{"Error": f"Invalid XPath: {str(e)}" if self.selector_type == "XPath" else f"Extraction failed: {str(e)}"}]
+        
+        if not container_elements:
+            return [{"Error": f"No container elements matched: {self.container_selector}"}]
+        if self.field_error:
+            return [{"Error": self.field_error}]
+        
+        base_url = extractor.base_url
+        results = []
+        try:
+            for i, container in enumerate(container_elements):
+                row_data = {"Block Index": i + 1}
+                for col_name, extract in self.fields:
+                    value = extract(container, base_url)
+                    row_data[col_name] = value if value is not None else "MISSING"
+                results.append(row_data)
+        except Exception as e:
+            return [{"Error": f"Extraction failed: {str(e)}"}]
+        return results
+
+@lru_cache(maxsize=32)
+def compile_extraction_plan(container_selector, relative_map_json, attr="text", selector_type="CSS") -> ExtractionPlan:
+    """Compiles (once per distinct configuration) the plan extract_custom_data_blocks runs."""
+    return ExtractionPlan(container_selector, relative_map_json, attr, selector_type)
+
+
+# ========== JSON API EXTRACTION ==========
+
+JSON_PATH_TOKEN = re.compile(r"\[(\d+|\*)\]|\[['\"]([^'\"]+)['\"]\]|([^.\[\]]+)")
+
+def json_path_find(data, path: str) -> list:
+    """
+    Minimal JSONPath: `$.data.items[*].name`, `items[0]`, `['odd key']`, `*`.
+    The leading `$` is optional. Returns every matching value.
+    """
+    path = path.strip()
+    if path.startswith("$"):
+        path = path[1:]
+    
+    matches = [data]
+    for index, quoted, key in JSON_PATH_TOKEN.findall(path):
+        next_matches = []
+        for node in matches:
+            if index == "*" or key == "*":
+                if isinstance(node, list):
+                    next_matches.extend(node)
+                elif isinstance(node, dict):
+                    next_matches.extend(node.values())
+            elif index:
+                if isinstance(node, list) and int(index) < len(node):
+                    next_matches.append(node[int(index)])
+            else:
+                name = quoted or key
+                if isinstance(node, dict) and name in node:
+                    next_matches.append(node[name])
+        matches = next_matches
+    return matches
+
+def extract_json_records(payloads: list[dict], records_path: str, relative_map_json: str) -> list[dict]:
+    """
+    Extracts rows from captured API payloads. `records_path` selects the list of
+    records in each payload; the relative map gives a JSON path per column.
+    """
+    try:
+        relative_map = json.loads(relative_map_json)
+    except json.JSONDecodeError:
+        return [{"Error": "Invalid JSON format in Relative Selectors."}]
+    if not isinstance(relative_map, dict) or not all(isinstance(path, str) for path in relative_map.values()):
+        return [{"Error": 'Relative Selectors must be a JSON object of column names to paths, e.g. {"Name": "name"}.'}]
+    
+    results = []
+    try:
+        for p_idx, payload in enumerate(payloads):
+            for record in json_path_find(payload.get("data"), records_path):
+                row_data = {"Block Index": len(results) + 1}
+                for col_name, rel_path in relative_map.items():
+                    found = json_path_find(record, rel_path)
+                    if not found or found[0] is None:
+                        row_data[col_name] = "MISSING"
+                    elif isinstance(found[0], (dict, list)):
+                        row_data[col_name] = json.dumps(found[0], ensure_ascii=False)
+                    else:
+                        row_data[col_name] = found[0]
+                row_data["Source Response"] = p_idx + 1
+                results.append(row_data)
+    except Exception as e:
+        return [{"Error": f"Extraction failed: {str(e)}"}]
+    
+    if not results:
+        return [{"Error": f"No records matched: {records_path}"}]
+    return results
+
+# ========== PARALLEL EXTRACTION ==========
+
+EXTRACTION_WORKERS = os.cpu_count() or 1 # Parsing and extraction are pure CPU work, one process per core
+CLASSED_ELEMENTS = etree.XPath("//*[@class]")
+
+def _class_counts(ext) -> Counter:
+    classes = Counter()
+    for tag in CLASSED_ELEMENTS(ext.tree):
+        classes.update(tag.get("class").split())
+    return classes
+
+# Record kind -> how to compute it from a page's Extractor and the extraction options
+PAGE_RECORDS = {
+    "metadata": lambda ext, extra_social_domains, custom: ext.get_metadata(),
+    "emails": lambda ext, extra_social_domains, custom: ext.get_emails(),
+    "phones": lambda ext, extra_social_domains, custom: ext.get_phones(),
+    "addresses": lambda ext, extra_social_domains, custom: ext.get_addresses(),
+    "socials": lambda ext, extra_social_domains, custom: ext.get_socials(extra_social_domains),
+    "links": lambda ext, extra_social_domains, custom: ext.get_links(),
+    "companies": lambda ext, extra_social_domains, custom: ext.get_company_names(),
+    "portfolios": lambda ext, extra_social_domains, custom: ext.get_portfolio_blocks(),
+    "images": lambda ext, extra_social_domains, custom: ext.get_images(),
+    "tables": lambda ext, extra_social_domains, custom: ext.get_tables(),
+    "classes": lambda ext, extra_social_domains, custom: _class_counts(ext),
+    "custom": lambda ext, extra_social_domains, custom: compile_extraction_plan(*custom).run(ext) if custom else None,
+}
+
+def extract_page(html: str, base_url: str, extra_social_domains: tuple = (), custom: tuple = None, kinds: tuple = None) -> dict:
+    """
+    Runs the requested extractors (all of PAGE_RECORDS by default) over one page,
+    with a single parse, and returns plain, picklable records. Runs inside pool workers.
+    `custom` is the (container, relative map, attr, selector type) spec, if any.
+    """
+    ext = Extractor(html, base_url)
+    return {kind: PAGE_RECORDS[kind](ext, extra_social_domains, custom) for kind in (kinds or PAGE_RECORDS)}
+
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+def get_extraction_pool():
+    """One process pool per process, sized to the machine, shared across sessions and reruns."""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn: never fork the Streamlit server and its threads
+            _extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _extraction_pool
+
+def reset_extraction_pool():
+    """Forgets a broken pool so the next run gets a fresh one."""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        _extraction_pool = None
+
+class ExtractionBatch:
+    """
+    Fans the pages of one run out to the extraction pool as they arrive and
+    collects their records in page order. Single-core machines extract inline.
+    """
+    def __init__(self, extra_social_domains: tuple = (), custom: tuple = None, kinds: tuple = None):
+        self.options = (tuple(extra_social_domains), custom, tuple(kinds) if kinds else None)
+        self.pool = get_extraction_pool() if EXTRACTION_WORKERS > 1 else None
+        self.futures = {}
+
+    def submit(self, index: int, html: str, base_url: str):
+        if index in self.futures or self.pool is None:
+            return
+        try:
+            self.futures[index] = self.pool.submit(extract_page, html, base_url, *self.options)
+        except RuntimeError: # Broken or shut down pool: finish this run inline
+            self._drop_pool()
+
+    def _drop_pool(self):
+        self.pool = None
+        reset_extraction_pool()
+
+    def results(self, htmls: list[str], base_url: str) -> list[dict]:
+        """Records for every page; pages the stream didn't deliver (cache hits, static path) are submitted now."""
+        from concurrent.futures.process import BrokenProcessPool
+        for i, html in enumerate(htmls):
+            self.submit(i, html, base_url)
+        records = []
+        for i, html in enumerate(htmls):
+            future = self.futures.get(i)
+            if future is not None:
+                try:
+                    records.append(future.result())
+                    continue
+                except BrokenProcessPool:
+                    self._drop_pool()
+            records.append(extract_page(html, base_url, *self.options))
+        return records
+
+# ========== REPLAY ==========
+
+def extract_stored_page(blob_dir: str, digest: str, base_url: str, extra_social_domains: tuple = (),
+                        custom: tuple = None, kinds: tuple = None) -> dict:
+    """extract_page for a page store blob; the worker reads the page itself."""
+    html = (read_blob(blob_dir, digest) or b"").decode("utf-8")
+    return extract_page(html, base_url, extra_social_domains, custom, kinds)
+
+class LazyPages:
+    """The HTML of stored pages as a read-only sequence; each page is read from disk when indexed."""
+    def __init__(self, store: PageStore, pages: list[StoredPage]):
+        self.store = store
+        self.pages = pages
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __getitem__(self, i):
+        return self.store.get_text(self.pages[i].digest) or ""
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+def replay_extraction(pages: list[StoredPage], extra_social_domains: tuple = (), custom: tuple = None,
+                      kinds: tuple = None, store: PageStore = None, on_progress=None):
+    """
+    Re-runs extraction over stored pages without any network or browser.
+    Yields (StoredPage, record) in order; with several cores the pages are
+    spread over the extraction pool, each worker reading its pages from disk.
+    on_progress(done, total) is called after each page.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+    
+    blob_dir = (store or get_page_store()).blob_dir
+    options = (tuple(extra_social_domains), custom, tuple(kinds) if kinds else None)
+    
+    def inline(batch):
+        return (extract_stored_page(blob_dir, p.digest, p.base_url, *options) for p in batch)
+    
+    records = inline(pages)
+    if EXTRACTION_WORKERS > 1 and len(pages) > 1:
+        n = len(pages)
+        records = get_extraction_pool().map(
+            extract_stored_page, [blob_dir] * n, [p.digest for p in pages], [p.base_url for p in pages],
+            *([option] * n for option in options),
+            chunksize=max(1, min(32, n // (EXTRACTION_WORKERS * 4)))
+        )
+    
+    done = 0
+    try:
+        for record in records:
+            yield pages[done], record
+            done += 1
+            if on_progress:
+                on_progress(done, len(pages))
+    except BrokenProcessPool:
+        reset_extraction_pool()
+        for record in inline(pages[done:]):
+            yield pages[done], record
+            done += 1
+            if on_progress:
+                on_progress(done, len(pages))
+
+# ========== RESULT WRITERS ==========
+
+class RowWriter:
+    """
+    Appends batches of row dicts to a file as they are produced, so results
+    never have to sit in memory. `columns`, or else the first batch, fixes the
+    columns; later rows fill the missing ones with blanks and drop unknown ones.
+    With columns given up front, a file without rows still gets its header.
+    """
+    def __init__(self, path: str, columns: list = None):
+        self.path = path
+        self.columns = None if columns is None else list(columns)
+        self.rows_written = 0
+        self._opened = False
+
+    def write(self, rows: list[dict]):
+        if not rows:
+            return
+        if self.columns is None:
+            self.columns = list(dict.fromkeys(key for row in rows for key in row))
+        if not self._opened:
+            self._open()
+            self._opened = True
+        self._write_rows([[row.get(col) for col in self.columns] for row in rows])
+        self.rows_written += len(rows)
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _write_rows(self, values: list[list]):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def close(self):
+        """Finishes the file; without any columns there is nothing to write and no file."""
+        if self.columns is None:
+            return
+        if not self._opened:
+            self._open() # Header (or schema) only
+            self._opened = True
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        import gzip
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+class CsvRowWriter(RowWriter):
+    def _open(self):
+        import csv
+        self._file = _open_text(self.path)
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(self.columns)
+
+    def _write_rows(self, values):
+        self._csv.writerows(values)
+
+    def _close(self):
+        self._file.close()
+
+class NdjsonRowWriter(RowWriter):
+    def _open(self):
+        self._file = _open_text(self.path)
+
+    def _write_rows(self, values):
+        for row in values:
+            self._file.write(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False, default=str) + "\n")
+
+    def _close(self):
+        self._file.close()
+
+FLOAT_EXACT_INT = 2 ** 53 # Largest integer magnitude a float64 holds exactly
+
+def parquet_type(values):
+    """The Arrow type for a column (list or Series): bool, int, float or datetime when all values agree, else text."""
+    import pyarrow as pa
+    
+    try:
+        column_type = pa.array(values).type
+    except (pa.ArrowException, OverflowError):
+        return pa.string() # Mixed types, or ints too large for int64
+    if pa.types.is_boolean(column_type) or pa.types.is_integer(column_type) \
+            or pa.types.is_floating(column_type) or pa.types.is_temporal(column_type):
+        return column_type
+    return pa.string()
+
+def parquet_types(df) -> list:
+    """parquet_type of every column of a whole DataFrame, so no later row can disagree."""
+    return [parquet_type(df.iloc[:, i]) for i in range(df.shape[1])]
+
+def _arrow_values(values: list, column_type):
+    """The values as an Arrow array of column_type, or None when any of them would not survive it unchanged."""
+    import pyarrow as pa
+    
+    if pa.types.is_string(column_type):
+        return pa.array([None if v is None else str(v) for v in values], type=column_type)
+    try:
+        array = pa.array(values)
+    except (pa.ArrowException, OverflowError):
+        return None
+    kind = array.type
+    if pa.types.is_floating(column_type) and pa.types.is_integer(kind):
+        if any(v is not None and abs(v) > FLOAT_EXACT_INT for v in values):
+            return None
+    elif not (pa.types.is_null(kind)
+              or pa.types.is_boolean(kind) and pa.types.is_boolean(column_type)
+              or pa.types.is_integer(kind) and pa.types.is_integer(column_type)
+              or pa.types.is_floating(kind) and pa.types.is_floating(column_type)
+              or pa.types.is_temporal(kind) and pa.types.is_temporal(column_type)):
+        return None # e.g. "MISSING" in an int column: no silent parsing either
+    try:
+        return array.cast(column_type) # Safe cast: raises rather than truncate
+    except (pa.ArrowException, OverflowError):
+        return None
+
+class ParquetRowWriter(RowWriter):
+    """
+    Each batch becomes a row group. Column types are `types` when given (see
+    parquet_types), else they come from the first batch. A later value that
+    does not fit widens its column (int -> float -> text): the row groups
+    written so far are copied once into a file with the wider schema, so no
+    value is ever lost.
+    """
+    def __init__(self, path: str, columns: list = None, types: list = None):
+        super().__init__(path, columns)
+        self.types = types
+
+    def _open(self):
+        import pyarrow as pa
+        self._pa = pa
+        self._writer = None
+        self._target = self.path # Where the open writer writes; differs after a widening
+        self._widenings = 0
+
+    def _start(self, types):
+        import pyarrow.parquet as pq
+        self._schema = self._pa.schema([(str(col), t) for col, t in zip(self.columns, types)])
+        self._writer = pq.ParquetWriter(self._target, self._schema)
+
+    def _write_rows(self, values):
+        columns = [list(col) for col in zip(*values)]
+        if self._writer is None:
+            self._start(self.types or [parquet_type(col) for col in columns])
+        arrays = []
+        for i, col in enumerate(columns):
+            array = _arrow_values(col, self._schema.field(i).type)
+            if array is None:
+                self._widen(i, col)
+                array = _arrow_values(col, self._schema.field(i).type)
+            arrays.append(array)
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def _widen(self, i, values):
+        pa = self._pa
+        column_type = self._schema.field(i).type
+        numeric = pa.types.is_integer(column_type) or pa.types.is_floating(column_type)
+        wider = pa.float64() if numeric and _arrow_values(values, pa.float64()) is not None else pa.string()
+        self._writer.close()
+        # Rows already written may not fit a float either (huge ints): then text
+        if not self._rewrite(i, wider):
+            self._rewrite(i, pa.string())
+
+    def _rewrite(self, i, column_type) -> bool:
+        """Copies the file so far with column i as column_type; False (nothing changed) if a value does not fit."""
+        import pyarrow.parquet as pq
+        
+        schema = self._schema.set(i, self._schema.field(i).with_type(column_type))
+        self._widenings += 1
+        target = f"{self.path}.widen{self._widenings}"
+        writer = pq.ParquetWriter(target, schema)
+        for batch in pq.ParquetFile(self._target).iter_batches():
+            arrays = batch.columns
+            arrays[i] = _arrow_values(batch.column(i).to_pylist(), column_type)
+            if arrays[i] is None:
+                writer.close()
+                os.remove(target)
+                return False
+            writer.write_table(self._pa.Table.from_arrays(arrays, schema=schema))
+        os.remove(self._target)
+        self._target, self._writer, self._schema = target, writer, schema
+        return True
+
+    def _close(self):
+        if self._writer is None: # No rows: just the schema
+            self._start(self.types or [self._pa.string()] * len(self.columns))
+        self._writer.close()
+        if self._target != self.path:
+            os.replace(self._target, self.path)
+
+EXCEL_MAX_CELL = 32767 # Characters Excel keeps in a cell
+
+def excel_cell(value, illegal_characters):
+    """A value Excel accepts: NaN as blank, containers as text, no control characters, clipped to the cell limit."""
+    if isinstance(value, str):
+        return illegal_characters.sub("", value)[:EXCEL_MAX_CELL]
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, (list, tuple, dict, set)):
+        return illegal_characters.sub("", str(value))[:EXCEL_MAX_CELL]
+    return value
+
+class XlsxRowWriter(RowWriter):
+    """
+    One sheet, streamed with openpyxl's write-only mode: rows go straight to the
+    sheet's XML instead of an in-memory cell model. Pass a shared
+    Workbook(write_only=True) to put several writers' sheets in one file;
+    the caller then saves it.
+    """
+    def __init__(self, path: str, sheet_name: str = "Results", workbook=None, columns: list = None):
+        super().__init__(path, columns)
+        self.sheet_name = re.sub(r"[\[\]:*?/\\]", "", sheet_name)[:31] or "Sheet" # Excel's sheet name rules
+        self._workbook = workbook
+        self._owns_workbook = workbook is None
+
+    def _open(self):
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        if self._workbook is None:
+            from openpyxl import Workbook
+            self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(self.sheet_name)
+        self._sheet.append([str(col) for col in self.columns])
+
+    def _write_rows(self, values):
+        for row in values:
+            self._sheet.append([excel_cell(v, self._illegal) for v in row])
+
+    def _close(self):
+        if self._owns_workbook:
+            self._workbook.save(self.path)
+
+ROW_WRITERS = {
+    ".csv": CsvRowWriter,
+    ".csv.gz": CsvRowWriter,
+    ".ndjson": NdjsonRowWriter,
+    ".jsonl": NdjsonRowWriter,
+    ".ndjson.gz": NdjsonRowWriter,
+    ".parquet": ParquetRowWriter,
+    ".xlsx": XlsxRowWriter,
+}
+
+def open_row_writer(path: str, columns: list = None, **options) -> RowWriter:
+    """Picks a streaming writer from the file extension; `options` go to the writer (e.g. Parquet `types`)."""
+    for ext in sorted(ROW_WRITERS, key=len, reverse=True):
+        if path.lower().endswith(ext):
+            return ROW_WRITERS[ext](path, columns=columns, **options)
+    raise ValueError(f"Unsupported output format: {path} (use {', '.join(ROW_WRITERS)})")
@@ -2,13 +2,31 @@
 """
 Playwright Helper Script - Runs in subprocess to avoid threading conflicts.
 Usage: python playwright_helper.py <url> <automation_json>
+       python playwright_helper.py --serve [--max-pages N]
+
+In --serve mode the helper keeps one Chromium instance warm and reads
+newline-delimited JSON requests from stdin. Each fetch is answered with a
+stream of NDJSON records on stdout (page, payload, log) as they happen,
+closed by a "done" record.
 """
 import sys
 import json
 import time
 import random # Added for stealth mode
-from playwright.sync_api import sync_playwright
-from urllib.parse import urljoin
+import base64
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
+from urllib.parse import urljoin, urlparse
+
+from politeness import HostScheduler, host_of, THROTTLE_STATUSES
+from archive import open_archive
+
+try:
+    import zstandard # Optional: compresses streamed pages
+except ImportError:
+    zstandard = None
 
 def human_scroll(page):
     """Scrolls the page like a human."""
@@ -51,31 +69,276 @@ def human_mouse_move(page, start_x, start_y, end_x, end_y, steps=25):
     # Final move to exact target
     page.mouse.move(end_x, end_y)
 
-def run_playwright_automation(url, use_proxy=None, automation_config=None):
-    debug_log = []
-    html_pages = []
+# ========== READINESS ==========
+
+READY_MODES = ("networkidle", "selector", "dom_quiet", "response", "fixed")
+NETWORK_IDLE_MS = 500 # Quiet period with no request in flight that counts as idle
+
+# Resolves once no DOM mutation has happened for quietMs, or false at the ceiling
+DOM_QUIET_JS = """
+([quietMs, ceilingMs]) => new Promise(resolve => {
+    let timer;
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => { observer.disconnect(); resolve(true); }, quietMs);
+    });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    timer = setTimeout(() => { observer.disconnect(); resolve(true); }, quietMs);
+    setTimeout(() => { observer.disconnect(); resolve(false); }, ceilingMs);
+})
+"""
+
+class ReadinessWaiter:
+    """
+    Waits for the page to be ready instead of sleeping a fixed time.
+    The condition comes from automation_config["ready_mode"]:
+      - networkidle: no request in flight for 500 ms, counted by the waiter itself,
+                     so XHR-driven clicks (which aren't navigations) are awaited too
+      - selector:    ready_selector matches at least ready_min_count elements
+      - dom_quiet:   no DOM mutations for ready_quiet_ms
+      - response:    a request whose URL contains ready_url has finished
+      - fixed:       the old behaviour, sleep wait_time
+    wait_time is only used as the ceiling for the other modes. selector and
+    response without their parameter fall back to networkidle.
+    """
+    def __init__(self, page, automation_config, debug_log):
+        self.page = page
+        self.mode = automation_config.get("ready_mode", "networkidle")
+        if self.mode not in READY_MODES:
+            self.mode = "networkidle"
+        self.ceiling = automation_config.get("wait_time", 10)
+        self.selector = automation_config.get("ready_selector") or ""
+        self.min_count = int(automation_config.get("ready_min_count", 1))
+        self.quiet_ms = int(automation_config.get("ready_quiet_ms", 500))
+        self.url_pattern = automation_config.get("ready_url") or ""
+        self.debug_log = debug_log
+        self._response_seen = False
+        self._in_flight = 0
+        self._last_activity = time.time()
+        
+        if (self.mode == "selector" and not self.selector) or (self.mode == "response" and not self.url_pattern):
+            debug_log.append(f"⚠ Wait mode '{self.mode}' has nothing to wait for, using networkidle")
+            self.mode = "networkidle"
+        
+        if self.mode == "response":
+            page.on("requestfinished", self._on_request_finished)
+        elif self.mode == "networkidle":
+            page.on("request", self._on_request)
+            page.on("requestfinished", self._on_request_done)
+            page.on("requestfailed", self._on_request_done)
+
+    def _on_request_finished(self, request):
+        if self.url_pattern and self.url_pattern in request.url:
+            self._response_seen = True
+
+    def _on_request(self, request):
+        self._in_flight += 1
+        self._last_activity = time.time()
+
+    def _on_request_done(self, request):
+        self._in_flight = max(0, self._in_flight - 1)
+        self._last_activity = time.time()
+
+    def arm(self):
+        """Call right before the action (navigation/click) that should be awaited."""
+        self._response_seen = False
+        self._last_activity = time.time() # Idle only counts from the action on
+
+    def _wait_until(self, deadline):
+        """One readiness check on the current document; True when ready before `deadline`."""
+        ceiling_ms = max(0, (deadline - time.time()) * 1000)
+        if self.mode == "fixed":
+            time.sleep(ceiling_ms / 1000)
+        elif self.mode == "networkidle":
+            # wait_for_timeout keeps Playwright's event loop pumping so the listeners fire
+            while time.time() < deadline:
+                if self._in_flight == 0 and (time.time() - self._last_activity) * 1000 >= NETWORK_IDLE_MS:
+                    return True
+                self.page.wait_for_timeout(50)
+            return False
+        elif self.mode == "selector":
+            self.page.wait_for_function(
+                "([sel, n]) => document.querySelectorAll(sel).length >= n",
+                arg=[self.selector, self.min_count],
+                timeout=ceiling_ms
+            )
+        elif self.mode == "dom_quiet":
+            return self.page.evaluate(DOM_QUIET_JS, [self.quiet_ms, ceiling_ms])
+        elif self.mode == "response":
+            # wait_for_timeout keeps Playwright's event loop pumping so the listener fires
+            while not self._response_seen and time.time() < deadline:
+                self.page.wait_for_timeout(100)
+            return self._response_seen
+        return True
+
+    def wait(self, label=""):
+        start = time.time()
+        deadline = start + self.ceiling
+        ready = False
+        # A navigation mid-wait (e.g. a JS redirect) destroys the execution context:
+        # wait once more on the new document, within the same ceiling
+        for attempt in range(2):
+            try:
+                ready = self._wait_until(deadline)
+                break
+            except PlaywrightTimeoutError:
+                break
+            except PlaywrightError as e:
+                if attempt:
+                    break
+                self.debug_log.append(f"⚠ Page changed while waiting ({str(e).splitlines()[0]}), waiting on the new document")
+                try:
+                    self.page.wait_for_load_state("domcontentloaded", timeout=max(0, (deadline - time.time()) * 1000))
+                except PlaywrightError:
+                    break
+        
+        elapsed = round(time.time() - start, 2)
+        if ready:
+            self.debug_log.append(f"Ready ({self.mode}) {label} after {elapsed}s")
+        else:
+            self.debug_log.append(f"Readiness ceiling hit ({self.mode}) {label} after {elapsed}s")
+        return ready
+
+# ========== API CAPTURE ==========
+
+class ResponseRecorder:
+    """
+    Records JSON bodies of network responses while the automation runs.
+    Listens on the whole context, so detail tabs are covered too.
+    Filters: automation_config["capture_url"] (substring of the request URL)
+    and automation_config["capture_content_type"] (substring of Content-Type).
+    """
+    def __init__(self, context, automation_config, debug_log, emit=None, archiver=None):
+        self.url_pattern = automation_config.get("capture_url") or ""
+        self.content_type = automation_config.get("capture_content_type") or "json"
+        self.debug_log = debug_log
+        self.emit = emit
+        self.archiver = archiver
+        self.payloads = []
+        context.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if self.url_pattern and self.url_pattern not in response.url:
+            return
+        if self.content_type not in response.headers.get("content-type", "").lower():
+            return
+        try:
+            body = response.body()
+            data = json.loads(body)
+        except Exception as e:
+            self.debug_log.append(f"✗ Could not decode {response.url}: {str(e)}")
+            return
+        if self.archiver:
+            self.archiver.response(response.url, body, response.status, response.headers)
+        payload = {"url": response.url, "status": response.status, "data": data}
+        if self.emit:
+            self.emit(dict(payload, type="payload"))
+        else:
+            self.payloads.append(payload)
+        self.debug_log.append(f"✓ Captured API response {response.url}")
+
+# ========== RESOURCE BLOCKING ==========
+
+# Each profile lists the resource types to abort, whether known trackers are
+# aborted, and whether requests to other sites are aborted. Types in
+# "third_party_keep" survive the third-party rule (e.g. cross-domain APIs).
+BLOCK_PROFILES = {
+    "off": {"types": set(), "trackers": False, "third_party": False, "third_party_keep": set()},
+    "balanced": {"types": {"image", "media", "font"}, "trackers": True, "third_party": False, "third_party_keep": set()},
+    "keep_xhr": {"types": {"image", "media", "font", "stylesheet"}, "trackers": True, "third_party": True, "third_party_keep": {"xhr", "fetch", "script"}},
+    "text_only": {"types": {"image", "media", "font", "stylesheet"}, "trackers": True, "third_party": True, "third_party_keep": set()},
+}
+
+TRACKER_DOMAINS = {
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "googleadservices.com", "facebook.net", "connect.facebook.net", "hotjar.com", "segment.io",
+    "segment.com", "mixpanel.com", "clarity.ms", "fullstory.com", "newrelic.com", "nr-data.net",
+    "amplitude.com", "intercom.io", "adsrvr.org", "criteo.com", "taboola.com", "outbrain.com",
+}
+
+SECOND_LEVEL_LABELS = {"co", "com", "org", "net", "gov", "edu", "ac"}
+
+def site_of(host):
+    """Approximate registrable domain: shop.example.com.sg -> example.com.sg"""
+    labels = host.lower().split(":")[0].split(".")
+    if len(labels) >= 3 and labels[-2] in SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+def is_tracker(host):
+    labels = host.lower().split(".")
+    return any(".".join(labels[i:]) in TRACKER_DOMAINS for i in range(len(labels) - 1))
+
+def install_resource_blocking(context, start_url, automation_config, debug_log):
+    """
+    Aborts requests the extraction never needs, according to
+    automation_config["block_profile"]. Returns a counter dict, or None when off.
+    """
+    profile = BLOCK_PROFILES.get(automation_config.get("block_profile", "off"), BLOCK_PROFILES["off"])
+    if profile is BLOCK_PROFILES["off"]:
+        return None
     
-    playwright = sync_playwright().start()
+    start_site = site_of(urlparse(start_url).netloc)
+    stats = {"blocked": 0, "allowed": 0}
     
-    # Stealth args
-    args = [
-        "--disable-blink-features=AutomationControlled",
-        "--no-sandbox",
-        "--disable-infobars",
-        "--start-maximized"
-    ]
+    def should_block(request):
+        resource_type = request.resource_type
+        if resource_type == "document":
+            return False
+        if resource_type in profile["types"]:
+            return True
+        host = urlparse(request.url).netloc
+        if profile["trackers"] and is_tracker(host):
+            return True
+        if profile["third_party"] and resource_type not in profile["third_party_keep"]:
+            try:
+                page_site = site_of(urlparse(request.frame.page.url).netloc) or start_site
+            except Exception:
+                page_site = start_site
+            return site_of(host) != page_site
+        return False
+    
+    def handle(route):
+        if should_block(route.request):
+            stats["blocked"] += 1
+            route.abort()
+        else:
+            stats["allowed"] += 1
+            route.continue_()
+    
+    context.route("**/*", handle)
+    debug_log.append(f"Resource blocking: {automation_config.get('block_profile')}")
+    return stats
+
+# Stealth args
+STEALTH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+    "--disable-infobars",
+    "--start-maximized"
+]
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+
+# Restart the browser after this many captured pages to cap memory growth
+DEFAULT_MAX_PAGES_PER_BROWSER = 50
+
+def launch_browser(playwright, use_proxy=None):
+    """Launches Chromium with the stealth arguments."""
+    args = list(STEALTH_ARGS)
     if use_proxy:
         args.append(f"--proxy-server={use_proxy}")
 
-    browser = playwright.chromium.launch(
+    return playwright.chromium.launch(
         headless=True,  # Set to False if you want to see it (helps debugging)
         args=args
     )
-    
-    # Create context with stealth headers
+
+def new_stealth_context(browser):
+    """Creates a fresh browser context with stealth headers and scripts."""
     context = browser.new_context(
         viewport={"width": 1920, "height": 1080},
-        user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+        user_agent=USER_AGENT,
         locale="en-US",
         timezone_id="Asia/Singapore"
     )
@@ -86,49 +349,345 @@ def run_playwright_automation(url, use_proxy=None, automation_config=None):
             get: () => undefined
         });
     """)
+    return context
+
+# ========== ARCHIVE ==========
+
+class SessionArchiver:
+    """
+    Appends what a fetch captures to the parent's response archive
+    (automation_config["archive"], its root directory). Archiving never fails a fetch.
+    """
+    def __init__(self, automation_config, debug_log):
+        self.debug_log = debug_log
+        self.archive = None
+        root = automation_config.get("archive")
+        if root:
+            try:
+                self.archive = open_archive(root)
+            except Exception as e:
+                debug_log.append(f"⚠ Archive unavailable: {str(e)}")
+
+    def _append(self, url, body, **kwargs):
+        if self.archive is None:
+            return
+        try:
+            self.archive.append(url, body, **kwargs)
+        except Exception as e:
+            self.debug_log.append(f"⚠ Could not archive {url}: {str(e)}")
+
+    def page(self, url, html):
+        """A rendered DOM snapshot: a WARC resource record, as no server sent it in this form."""
+        self._append(url, html.encode("utf-8"))
+
+    def response(self, url, body, status, headers):
+        self._append(url, body, content_type=headers.get("content-type", ""), status=status, headers=headers)
+
+# ========== POLITENESS ==========
+
+PACE_TIMEOUT = 300 # Longest wait for the parent's token before navigating anyway
+
+class ParentChannel:
+    """
+    The parent's HostScheduler, reached over stdout/stdin (--serve only): a "pace"
+    record asks for a token and blocks until the parent answers {"cmd": "paced"},
+    and every answer's status goes back at once as a "host_status" record. So
+    browser sessions and static fetches spend one per-host budget.
+    """
+    def __init__(self):
+        self.emit = None # Set per request: tags records with the request id
+        self._waiting = {} # ticket -> threading.Event
+        self._next_ticket = 0
+        self._lock = threading.Lock()
+
+    def pace(self, host):
+        event = threading.Event()
+        with self._lock:
+            self._next_ticket += 1
+            ticket = self._next_ticket
+            self._waiting[ticket] = event
+        try:
+            self.emit({"type": "pace", "host": host, "ticket": ticket})
+            event.wait(PACE_TIMEOUT)
+        finally:
+            with self._lock:
+                self._waiting.pop(ticket, None)
+
+    def paced(self, ticket):
+        """Called from the stdin reader when the parent grants a token."""
+        with self._lock:
+            event = self._waiting.get(ticket)
+        if event is not None:
+            event.set()
+
+    def report(self, host, status, retry_after):
+        self.emit({"type": "host_status", "host": host, "status": status, "retry_after": retry_after})
+
+class SessionPoliteness:
+    """
+    Per-host pacing for one fetch. Under --serve it goes through the ParentChannel;
+    standalone runs pace with a scheduler of their own.
+    """
+    def __init__(self, automation_config, debug_log, channel=None):
+        self.channel = channel
+        self.scheduler = None if channel else HostScheduler()
+        self.debug_log = debug_log
+
+    def pace(self, url):
+        (self.channel or self.scheduler).pace(host_of(url))
+
+    def note(self, url, status, retry_after=None):
+        host = host_of(url)
+        (self.channel or self.scheduler).report(host, status, retry_after)
+        if status in THROTTLE_STATUSES:
+            self.debug_log.append(f"⚠ {host} answered HTTP {status}, slowing down")
+
+# ========== DETAIL PAGES ==========
+
+# ========== PAGINATION ==========
+
+NUMBERED_PAGINATION = ".v-pagination__item" # Used when no Next button selector is given
+NUMBERED_CARDS = ".card.entity"              # Whose first card's text changes once the next page is in
+
+def find_next_button(page, next_selector, next_page_num):
+    """
+    The control that loads the next page, or None on the last page: the
+    `next_selector` match when one is configured (None once it is gone or
+    disabled), else the numbered pagination item for `next_page_num`.
+    """
+    if next_selector:
+        button = page.locator(next_selector).first
+        if button.count() == 0 or not button.is_enabled():
+            return None
+        return button
+    for item in page.locator(NUMBERED_PAGINATION).all():
+        text = item.inner_text().strip()
+        if text == str(next_page_num):
+            if item.get_attribute("type") == "button" or item.get_attribute("role") == "button":
+                return item
+            btn = item.locator("button")
+            if btn.count() > 0:
+                return btn.first
+            return item
+    return None
+
+def plan_detail_batches(urls, batch_size, per_host):
+    """
+    Groups (index, url) pairs into batches of at most batch_size,
+    with no more than per_host URLs from the same host in one batch.
+    """
+    pending = list(enumerate(urls))
+    while pending:
+        batch, deferred, host_counts = [], [], {}
+        for idx, item_url in pending:
+            host = urlparse(item_url).netloc.lower()
+            if len(batch) < batch_size and host_counts.get(host, 0) < per_host:
+                host_counts[host] = host_counts.get(host, 0) + 1
+                batch.append((idx, item_url))
+            else:
+                deferred.append((idx, item_url))
+        yield batch
+        pending = deferred
+
+def detail_readiness(automation_config):
+    """
+    The readiness settings for detail tabs. A ready_selector or ready_url
+    describes the list page and rarely appears on a detail page, so those
+    modes become networkidle there; the other modes carry over.
+    """
+    if automation_config.get("ready_mode") in ("selector", "response"):
+        return dict(automation_config, ready_mode="networkidle")
+    return automation_config
+
+def fetch_details_in_browser(context, urls, automation_config, debug_log, politeness=None):
+    """
+    Loads detail pages on several tabs of the same context (so cookies are shared).
+    Navigations are started back to back and only then awaited, so the pages
+    load and settle in parallel. Returns HTML in the order of `urls` (None on failure).
+    """
+    politeness = politeness or SessionPoliteness(automation_config, debug_log)
+    concurrency = max(1, int(automation_config.get("detail_concurrency", 4)))
+    per_host = max(1, int(automation_config.get("detail_per_host", 2)))
+    results = [None] * len(urls)
+    
+    pages = [context.new_page() for _ in range(min(concurrency, len(urls)))]
+    readiness = detail_readiness(automation_config)
+    waiters = [ReadinessWaiter(p, readiness, debug_log) for p in pages]
+    try:
+        for batch in plan_detail_batches(urls, len(pages), per_host):
+            started = []
+            for (idx, item_url), page, waiter in zip(batch, pages, waiters):
+                try:
+                    politeness.pace(item_url)
+                    waiter.arm()
+                    # "commit" returns once the response starts; the rest loads in the background
+                    response = page.goto(item_url, wait_until="commit", timeout=15000)
+                    if response:
+                        politeness.note(item_url, response.status, response.headers.get("retry-after"))
+                    started.append((idx, item_url, page, waiter))
+                except Exception as e:
+                    debug_log.append(f"✗ Detail {idx + 1} failed to start: {str(e)}")
+            
+            for idx, item_url, page, waiter in started:
+                try:
+                    page.wait_for_load_state("domcontentloaded", timeout=15000)
+                    waiter.wait(item_url)
+                    results[idx] = page.content()
+                except Exception as e:
+                    debug_log.append(f"✗ Detail {idx + 1} failed: {str(e)}")
+    finally:
+        for page in pages:
+            page.close()
+    return results
+
+def fetch_details_over_http(context, urls, automation_config, debug_log, politeness=None):
+    """
+    Fetches detail pages with plain HTTP (no JavaScript), reusing the browser's cookies.
+    Returns HTML in the order of `urls` (None on failure).
+    """
+    import requests
+    
+    politeness = politeness or SessionPoliteness(automation_config, debug_log)    
+    concurrency = max(1, int(automation_config.get("detail_concurrency", 4)))
+    per_host = max(1, int(automation_config.get("detail_per_host", 2)))
+    
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    for cookie in context.cookies():
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+    
+    host_slots = {}
+    for item_url in urls:
+        host = urlparse(item_url).netloc.lower()
+        host_slots.setdefault(host, threading.BoundedSemaphore(per_host))
+    
+    def fetch_one(item_url):
+        with host_slots[urlparse(item_url).netloc.lower()]:
+            try:
+                politeness.pace(item_url)
+                resp = session.get(item_url, timeout=15)
+                politeness.note(item_url, resp.status_code, resp.headers.get("Retry-After"))
+                resp.raise_for_status()
+                return resp.text
+            except Exception as e:
+                debug_log.append(f"✗ Detail {item_url} failed: {str(e)}")
+                return None
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(fetch_one, urls))
+
+def run_playwright_automation(url, use_proxy=None, automation_config=None):
+    """One-shot mode: launches a browser, runs the automation, tears it all down."""
+    playwright = sync_playwright().start()
+    browser = launch_browser(playwright, use_proxy)
+    context = new_stealth_context(browser)
+    
+    try:
+        return run_automation_in_context(context, url, automation_config)
+    finally:
+        context.close()
+        browser.close()
+        playwright.stop()
+
+class StreamingLog(list):
+    """A debug log that also forwards every line to emit() as it is added."""
+    def __init__(self, emit):
+        super().__init__()
+        self.emit = emit
+
+    def append(self, line):
+        super().append(line)
+        self.emit({"type": "log", "line": line})
+
+def run_automation_in_context(context, url, automation_config=None, emit=None, channel=None):
+    """
+    Runs the configured automation on a new page of an existing context.
+    Without emit, pages and payloads are collected into the returned dict.
+    With emit, each page, payload and log line is handed to emit() as soon as
+    it is captured and the returned dict only carries the totals.
+    """
+    debug_log = StreamingLog(emit) if emit else []
+    html_pages = []
+    page_count = 0
+    if automation_config is None:
+        automation_config = {"type": "single"}
+    
+    # With capture_only the rendered HTML is not shipped back, only API payloads
+    archiver = SessionArchiver(automation_config, debug_log)
+    recorder = ResponseRecorder(context, automation_config, debug_log, emit, archiver) if automation_config.get("capture") else None
+    politeness = SessionPoliteness(automation_config, debug_log, channel)
+    capture_only = bool(recorder and automation_config.get("capture_only"))
+    
+    def keep_page(html, page_url):
+        nonlocal page_count
+        if capture_only:
+            return
+        archiver.page(page_url, html)
+        if emit:
+            emit({"type": "page", "index": page_count, "html": html})
+        else:
+            html_pages.append(html)
+        page_count += 1
+    
+    block_stats = install_resource_blocking(context, url, automation_config, debug_log)
+    
+    def finish():
+        if block_stats:
+            debug_log.append(f"Blocked {block_stats['blocked']} of {block_stats['blocked'] + block_stats['allowed']} requests")
+        result = {"success": True, "html_pages": html_pages, "debug_log": debug_log, "page_count": page_count}
+        if recorder:
+            result["json_payloads"] = recorder.payloads
+        return result
     
     page = context.new_page()
     
     try:
+        waiter = ReadinessWaiter(page, automation_config, debug_log)
+        
         debug_log.append(f"Navigating to {url}...")
-        page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        waiter.arm()
+        response = page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        if response:
+            politeness.note(url, response.status, response.headers.get("retry-after"))
         
-        # Random initial wait
-        time.sleep(random.uniform(2, 4))
+        # Short random pause so the first interaction doesn't look scripted
+        time.sleep(random.uniform(0.3, 0.8))
         
         # Human scroll to trigger lazy loading
         human_scroll(page)
         
         # Wait for content
-        wait_time = automation_config.get("wait_time", 10)
-        time.sleep(wait_time)
+        waiter.wait("initial load")
         
         automation_type = automation_config.get("type", "single")
         
         if automation_type == "single":
-            html_pages.append(page.content())
+            keep_page(page.content(), page.url)
             
         elif automation_type == "pagination":
             max_pages = automation_config.get("max_pages", 5)
+            next_selector = (automation_config.get("next_selector") or "").strip()
+            # With a Next button the page's cards are unknown, so any change of the body counts
+            change_selector = "body" if next_selector else NUMBERED_CARDS
             
             debug_log.append(f"Starting STEALTH pagination, max_pages: {max_pages}")
             
             # Wait for pagination controls
             debug_log.append(f"Waiting for pagination controls...")
             try:
-                page.wait_for_selector(".v-pagination__item", state="visible", timeout=20000)
+                page.wait_for_selector(next_selector or NUMBERED_PAGINATION, state="visible", timeout=20000)
                 debug_log.append(f"✓ Pagination controls loaded")
             except:
                 debug_log.append(f"✗ Pagination controls did not appear")
-                html_pages.append(page.content())
-                return {"success": True, "html_pages": html_pages, "debug_log": debug_log}
+                keep_page(page.content(), page.url)
+                return finish()
             
             for page_num in range(1, max_pages + 1):
                 debug_log.append(f"=== Page {page_num}/{max_pages} ===")
                 
                 # Capture current page
                 current_html = page.content()
-                html_pages.append(current_html)
+                keep_page(current_html, page.url)
                 debug_log.append(f"Captured page {page_num}, HTML length: {len(current_html)}")
                 
                 # Check for Incapsula block
@@ -138,7 +697,7 @@ def run_playwright_automation(url, use_proxy=None, automation_config=None):
                 
                 # Get current cards
                 try:
-                    current_cards = page.locator('.card.entity').all_inner_texts()
+                    current_cards = page.locator(change_selector).all_inner_texts()
                     debug_log.append(f"Found {len(current_cards)} data cards")
                     if len(current_cards) > 0:
                         debug_log.append(f"First card: {current_cards[0][:50]}...")
@@ -161,25 +720,12 @@ def run_playwright_automation(url, use_proxy=None, automation_config=None):
                 time.sleep(random.uniform(1, 2))
                 
                 try:
-                    # Find button robustly
-                    pagination_items = page.locator('.v-pagination__item').all()
-                    target_button = None
-                    
-                    for item in pagination_items:
-                        text = item.inner_text().strip()
-                        if text == str(next_page_num):
-                            if item.get_attribute("type") == "button" or item.get_attribute("role") == "button":
-                                target_button = item
-                                break
-                            btn = item.locator("button")
-                            if btn.count() > 0:
-                                target_button = btn.first
-                                break
-                            target_button = item
-                            break
+                    target_button = find_next_button(page, next_selector, next_page_num)
                     
                     if target_button:
                         debug_log.append(f"✓ Found target button for page {next_page_num}")
+                        politeness.pace(page.url) # Every page load spends the host's budget
+                        waiter.arm()
                         
                         try:
                             target_button.scroll_into_view_if_needed()
@@ -215,41 +761,39 @@ def run_playwright_automation(url, use_proxy=None, automation_config=None):
                             target_button.click(force=True)
                             page_button_clicked = True
                     else:
-                        debug_log.append(f"✗ Could not find page {next_page_num}")
+                        reason = f" (no enabled '{next_selector}')" if next_selector else ""
+                        debug_log.append(f"✗ Could not find page {next_page_num}{reason}")
                         break
                     
                     # Wait for cards to update
                     debug_log.append(f"Waiting for cards to update...")
-                    cards_updated = False
-                    
-                    for attempt in range(30):
-                        time.sleep(1)
-                        try:
-                            new_cards = page.locator('.card.entity').all_inner_texts()
-                            if len(new_cards) > 0 and new_cards[0] != first_card_text:
-                                debug_log.append(f"✓ Cards updated after {attempt+1}s!")
-                                cards_updated = True
-                                break
-                        except:
-                            pass
-                    
-                    if not cards_updated:
+                    try:
+                        page.wait_for_function(
+                            """([sel, oldText]) => {
+                                const card = document.querySelector(sel);
+                                return card !== null && card.innerText !== oldText;
+                            }""",
+                            arg=[change_selector, first_card_text],
+                            timeout=30000
+                        )
+                        debug_log.append(f"✓ Cards updated")
+                    except PlaywrightTimeoutError:
                         debug_log.append(f"✗ Cards did not update")
                         break
                     
-                    # Random wait for rendering
-                    time.sleep(wait_time + random.uniform(0, 2))
+                    # Let the rest of the page settle
+                    waiter.wait(f"page {next_page_num}")
                     debug_log.append(f"✓ Page {next_page_num} ready")
                     
                 except Exception as e:
                     debug_log.append(f"✗ Error: {str(e)}")
                     break
             
-            debug_log.append(f"=== Pagination complete: {len(html_pages)} pages scraped ===")
-            return {"success": True, "html_pages": html_pages, "debug_log": debug_log}
+            debug_log.append(f"=== Pagination complete: {page_num} pages scraped ===")
+            return finish()
             
         elif automation_type == "list_detail":
-            html_pages.append(page.content())
+            keep_page(page.content(), page.url)
             detail_sel = automation_config.get("detail_selector")
             max_items = automation_config.get("max_items", 5)
             
@@ -260,26 +804,151 @@ def run_playwright_automation(url, use_proxy=None, automation_config=None):
                 if href:
                     urls_to_visit.append(href)
             
-            for item_url in urls_to_visit:
-                try:
-                    if not item_url.startswith(("http", "https")):
-                        item_url = urljoin(page.url, item_url)
-                    page.goto(item_url, wait_until="domcontentloaded", timeout=15000)
-                    time.sleep(wait_time)
-                    html_pages.append(page.content())
-                except:
-                    continue
+            # Resolve against the list page before anything navigates away
+            urls_to_visit = [
+                u if u.startswith(("http", "https")) else urljoin(page.url, u)
+                for u in urls_to_visit
+            ]
+            
+            detail_fetch = automation_config.get("detail_fetch", "browser")
+            debug_log.append(f"Fetching {len(urls_to_visit)} detail pages ({detail_fetch})")
+            if detail_fetch == "http":
+                detail_pages = fetch_details_over_http(context, urls_to_visit, automation_config, debug_log, politeness)
+            else:
+                detail_pages = fetch_details_in_browser(context, urls_to_visit, automation_config, debug_log, politeness)
+            
+            # Failed pages are skipped, the rest keep the original link order
+            for item_url, h in zip(urls_to_visit, detail_pages):
+                if h is not None:
+                    keep_page(h, item_url)
         
-        return {"success": True, "html_pages": html_pages}
+        return finish()
         
     except Exception as e:
         return {"success": False, "error": str(e)}
     finally:
-        context.close()
-        browser.close()
+        page.close()
+
+def serve(max_pages_per_browser=DEFAULT_MAX_PAGES_PER_BROWSER):
+    """
+    Worker mode: keeps one browser warm and answers JSON requests line by line.
+    Requests look like {"id": 1, "cmd": "fetch", "url": ..., "automation": {...}}
+    or {"id": 2, "cmd": "ping"}. Every fetch gets its own fresh context, and the
+    browser is relaunched after max_pages_per_browser captured pages.
+    
+    A fetch streams records tagged with the request id:
+      {"type": "page", "index": 0, "html": ...}   (html is base64 zstd when "encoding": "zstd")
+      {"type": "payload", "url": ..., "status": ..., "data": ...}
+      {"type": "log", "line": ...}
+      {"type": "pace", "host": ..., "ticket": n}   (answered by {"cmd": "paced", "ticket": n})
+      {"type": "host_status", "host": ..., "status": ..., "retry_after": ...}
+      {"type": "done", "success": true, "pages": 3}
+        or  {"type": "done", "success": false, "error": ...}
+    stdin is read on a thread of its own, so "paced" answers arrive mid-fetch.
+    """
+    playwright = sync_playwright().start()
+    browser = launch_browser(playwright)
+    pages_served = 0
+    write_lock = threading.Lock() # HTTP detail threads may log concurrently
+    
+    def respond(payload):
+        line = json.dumps(payload) + "\n"
+        with write_lock:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+    
+    channel = ParentChannel()
+    requests = queue.Queue()
+    
+    def read_stdin():
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                respond({"success": False, "error": f"Bad request: {str(e)}"})
+                continue
+            if request.get("cmd") == "paced":
+                channel.paced(request.get("ticket"))
+            else:
+                requests.put(request)
+        requests.put(None) # EOF: the parent is gone
+    
+    threading.Thread(target=read_stdin, daemon=True).start()
+    
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            
+            request_id = request.get("id")
+            cmd = request.get("cmd", "fetch")
+            
+            if cmd == "shutdown":
+                respond({"id": request_id, "success": True})
+                break
+            
+            if cmd == "ping":
+                respond({
+                    "id": request_id,
+                    "success": browser.is_connected(),
+                    "pages_served": pages_served
+                })
+                continue
+            
+            # Recycle the browser if it crashed or has served too many pages
+            if not browser.is_connected() or pages_served >= max_pages_per_browser:
+                try:
+                    browser.close()
+                except Exception:
+                    pass
+                browser = launch_browser(playwright)
+                pages_served = 0
+            
+            compressor = zstandard.ZstdCompressor(level=3) if (zstandard and request.get("compress")) else None
+            
+            def emit(record):
+                if compressor and record.get("type") == "page":
+                    packed = compressor.compress(record["html"].encode("utf-8"))
+                    record = dict(record, html=base64.b64encode(packed).decode("ascii"), encoding="zstd")
+                respond(dict(record, id=request_id))
+            channel.emit = emit
+            
+            try:
+                context = new_stealth_context(browser)
+                try:
+                    result = run_automation_in_context(context, request.get("url"), request.get("automation"), emit, channel)
+                finally:
+                    context.close()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            
+            pages_served += max(result.get("page_count", 0), 1)
+            respond({
+                "id": request_id,
+                "type": "done",
+                "success": result["success"],
+                "error": result.get("error"),
+                "pages": result.get("page_count", 0)
+            })
+    finally:
+        try:
+            browser.close()
+        except Exception:
+            pass
         playwright.stop()
 
 if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--serve":
+        max_pages = DEFAULT_MAX_PAGES_PER_BROWSER
+        if "--max-pages" in sys.argv:
+            max_pages = int(sys.argv[sys.argv.index("--max-pages") + 1])
+        serve(max_pages)
+        sys.exit(0)
+    
     if len(sys.argv) < 3:
         print(json.dumps({"success": False, "error": "Missing arguments"}))
         sys.exit(1)
@@ -0,0 +1,151 @@
+"""
+Per-host politeness, shared by the static fetcher and the Playwright helper.
+
+Every host gets a token bucket (a steady request rate plus a small burst) and
+a cap on requests in flight. A 429/503 answer halves that host's rate and
+pauses it (for Retry-After when given); successful answers win the rate back
+gradually. Waiting only ever delays requests to the same host.
+"""
+import time
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+HOST_RATE = 2.0           # Steady requests per second per host
+HOST_BURST = 4            # Requests a rested host may get back to back
+HOST_MAX_IN_FLIGHT = 4    # Concurrent requests per host
+HOST_MIN_RATE = 0.1       # Slowest a throttling host is driven down to
+HOST_RECOVERY = 1.1       # Rate multiplier per successful answer, up to the configured rate
+THROTTLE_STATUSES = {429, 503}
+IN_FLIGHT_POLL = 0.05     # Seconds between checks while a host is at its in-flight cap
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+def parse_retry_after(value) -> float:
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if value is None or value == "":
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class HostState:
+    __slots__ = ("rate", "tokens", "stamp", "in_flight", "blocked_until")
+
+    def __init__(self, rate, tokens, now):
+        self.rate = rate
+        self.tokens = tokens
+        self.stamp = now
+        self.in_flight = 0
+        self.blocked_until = 0.0
+
+class Ticket:
+    """Handed out by slot(); set .status / .retry_after so the scheduler can adapt."""
+    __slots__ = ("status", "retry_after")
+
+    def __init__(self):
+        self.status = None
+        self.retry_after = None
+
+class HostScheduler:
+    """Thread-safe; usable from threads (slot, pace) and from asyncio (slot_async)."""
+    def __init__(self, rate: float = HOST_RATE, burst: int = HOST_BURST, max_in_flight: int = HOST_MAX_IN_FLIGHT):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str, now: float) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.rate, float(self.burst), now)
+        return state
+
+    def try_acquire(self, host: str, hold: bool = True) -> float:
+        """
+        Takes a token (and an in-flight slot when `hold`) and returns 0, or
+        returns how many seconds to wait before asking again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(host, now)
+            state.tokens = min(self.burst, state.tokens + (now - state.stamp) * state.rate)
+            state.stamp = now
+            if now < state.blocked_until:
+                return state.blocked_until - now
+            if hold and state.in_flight >= self.max_in_flight:
+                return IN_FLIGHT_POLL
+            if state.tokens < 1:
+                return (1 - state.tokens) / state.rate
+            state.tokens -= 1
+            if hold:
+                state.in_flight += 1
+            return 0.0
+
+    def report(self, host: str, status: int = None, retry_after=None):
+        """Feeds an answer's status back: 429/503 slow the host down, successes speed it back up."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(host, now)
+            if status in THROTTLE_STATUSES:
+                state.rate = max(HOST_MIN_RATE, state.rate / 2)
+                pause = parse_retry_after(retry_after)
+                if pause is None:
+                    pause = 1 / state.rate
+                state.blocked_until = max(state.blocked_until, now + pause)
+                state.tokens = min(state.tokens, 0.0)
+            elif status is not None and status < 400:
+                state.rate = min(self.rate, state.rate * HOST_RECOVERY)
+
+    def release(self, host: str, status: int = None, retry_after=None):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None:
+                state.in_flight = max(0, state.in_flight - 1)
+        self.report(host, status, retry_after)
+
+    @contextmanager
+    def slot(self, host: str):
+        """Blocks until `host` may get another request, holding an in-flight slot for the block."""
+        while True:
+            wait = self.try_acquire(host)
+            if not wait:
+                break
+            time.sleep(wait)
+        ticket = Ticket()
+        try:
+            yield ticket
+        finally:
+            self.release(host, ticket.status, ticket.retry_after)
+
+    @asynccontextmanager
+    async def slot_async(self, host: str):
+        """slot() for asyncio code: waits with asyncio.sleep, so other hosts keep going."""
+        import asyncio
+
+        while True:
+            wait = self.try_acquire(host)
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        ticket = Ticket()
+        try:
+            yield ticket
+        finally:
+            self.release(host, ticket.status, ticket.retry_after)
+
+    def pace(self, host: str):
+        """Blocks for a token only: paces further navigations inside an already held session."""
+        while True:
+            wait = self.try_acquire(host, hold=False)
+            if not wait:
+                return
+            time.sleep(wait)
@@ -0,0 +1,135 @@
+"""
+Tests for the table parser behind Extractor.get_tables, which replaces
+pandas.read_html: every case is also checked against read_html itself.
+"""
+import io
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from crawler_core import Extractor
+
+def tables(html: str) -> list:
+    return Extractor(f"<html><body>{html}</body></html>", "https://example.com/").get_tables()
+
+def assert_matches_read_html(html: str):
+    ours = tables(html)
+    theirs = pd.read_html(io.StringIO(html))
+    assert len(ours) == len(theirs)
+    for df, expected in zip(ours, theirs):
+        assert_frame_equal(df, expected)
+
+# ========== SPANS ==========
+
+def test_colspan_repeats_the_cell():
+    html = "<table><tr><th>A</th><th>B</th><th>C</th></tr><tr><td colspan='2'>wide</td><td>c</td></tr></table>"
+    df = tables(html)[0]
+    assert df.iloc[0].tolist() == ["wide", "wide", "c"]
+    assert_matches_read_html(html)
+
+def test_rowspan_carries_down():
+    html = ("<table><tr><th>A</th><th>B</th></tr>"
+            "<tr><td rowspan='3'>tall</td><td>1</td></tr><tr><td>2</td></tr><tr><td>3</td></tr></table>")
+    df = tables(html)[0]
+    assert df["A"].tolist() == ["tall"] * 3
+    assert df["B"].tolist() == [1, 2, 3]
+    assert_matches_read_html(html)
+
+def test_rowspan_past_the_last_row_adds_rows():
+    html = "<table><tr><th>A</th><th>B</th></tr><tr><td rowspan='3'>x</td><td>y</td></tr></table>"
+    assert_matches_read_html(html)
+
+def test_mixed_spans():
+    html = ("<table><thead><tr><th rowspan='2'>Name</th><th colspan='2'>Score</th></tr>"
+            "<tr><th>Q1</th><th>Q2</th></tr></thead>"
+            "<tbody><tr><td>a</td><td colspan='2'>5</td></tr><tr><td rowspan='2'>b</td><td>1</td><td>2</td></tr>"
+            "<tr><td>3</td><td>4</td></tr></tbody></table>")
+    df = tables(html)[0]
+    assert isinstance(df.columns, pd.MultiIndex)
+    assert df.shape == (3, 3)
+    assert_matches_read_html(html)
+
+# ========== HEADERS ==========
+
+def test_leading_th_rows_are_the_header():
+    html = "<table><tr><th>Name</th><th>Age</th></tr><tr><td>Ann</td><td>30</td></tr></table>"
+    assert tables(html)[0].columns.tolist() == ["Name", "Age"]
+    assert_matches_read_html(html)
+
+def test_thead_is_the_header():
+    html = "<table><thead><tr><td>Name</td><td>Age</td></tr></thead><tbody><tr><td>Ann</td><td>30</td></tr></tbody></table>"
+    assert tables(html)[0].columns.tolist() == ["Name", "Age"]
+    assert_matches_read_html(html)
+
+def test_no_header_gives_numbered_columns():
+    html = "<table><tr><td>Ann</td><td>30</td></tr><tr><td>Bob</td><td>41</td></tr></table>"
+    assert tables(html)[0].columns.tolist() == [0, 1]
+    assert_matches_read_html(html)
+
+def test_blank_and_duplicate_header_names():
+    html = "<table><tr><th>A</th><th></th><th>A</th></tr><tr><td>1</td><td>2</td><td>3</td></tr></table>"
+    assert tables(html)[0].columns.tolist() == ["A", "Unnamed: 1", "A.1"]
+    assert_matches_read_html(html)
+
+def test_blank_rows_of_one_column_tables_are_skipped():
+    html = "<table><tr><th>A</th></tr><tr><td>x</td></tr><tr><td> </td></tr><tr></tr><tr><td>y</td></tr></table>"
+    assert tables(html)[0]["A"].tolist() == ["x", "y"]
+    assert_matches_read_html(html)
+
+@pytest.mark.parametrize("head", [
+    "<tr><th>A</th><th>B</th></tr><tr><th></th><th></th></tr>",
+    "<tr><th></th><th></th></tr><tr><th>A</th><th>B</th></tr>",
+    "<tr><th>X</th><th>Y</th></tr><tr><th></th><th></th></tr><tr><th>A</th><th>B</th></tr>",
+])
+def test_empty_header_rows_are_ignored(head):
+    assert_matches_read_html(f"<table><thead>{head}</thead><tbody><tr><td>1</td><td>2</td></tr></tbody></table>")
+
+def test_hidden_rows_and_tables_are_skipped():
+    html = ("<table><tr><th>A</th></tr><tr style='display: none'><td>hidden</td></tr><tr><td>shown</td></tr></table>"
+            "<table style='display:none'><tr><td>x</td></tr></table>")
+    found = tables(html)
+    assert len(found) == 1
+    assert found[0]["A"].tolist() == ["shown"]
+
+# ========== CELL TEXT ==========
+
+@pytest.mark.parametrize("cell, text", [
+    ("x<br>y", "x y"),
+    ("x <br/> y", "x y"),
+    ("p<br>q<!-- note --><b>r<br></b>s", "p qr s"),
+])
+def test_br_reads_as_a_space(cell, text):
+    html = f"<table><tr><th>A</th></tr><tr><td>{cell}</td></tr><tr><td>other</td></tr></table>"
+    assert tables(html)[0]["A"].tolist()[0] == text
+    assert_matches_read_html(html)
+
+def test_br_does_not_change_the_page():
+    extractor = Extractor("<html><body><table><tr><td>x<br>y</td></tr></table></body></html>", "https://example.com/")
+    extractor.get_tables()
+    assert extractor.tree.find(".//br").tail == "y"
+
+# ========== NUMBERS ==========
+
+@pytest.mark.parametrize("values", [
+    ["1", "2", "3"],
+    ["1,000", "1,000,000", "1,00"],
+    ["1,000.5", "-2,000", "NA"],
+    ["1.5", "", "3"],
+])
+def test_numeric_columns(values):
+    rows = "".join(f"<tr><td>{v}</td></tr>" for v in values)
+    html = f"<table><tr><th>A</th></tr>{rows}</table>"
+    assert pd.api.types.is_numeric_dtype(tables(html)[0]["A"])
+    assert_matches_read_html(html)
+
+def test_thousands_are_dropped_in_text_columns_too():
+    html = ("<table><tr><th>A</th></tr><tr><td>1,000</td></tr><tr><td>abc</td></tr>"
+            "<tr><td>,5</td></tr><tr><td>1,2,3</td></tr></table>")
+    assert tables(html)[0]["A"].tolist() == ["1000", "abc", ",5", "123"]
+    assert_matches_read_html(html)
+
+@pytest.mark.parametrize("values", [["True", "false", "TRUE"], ["True", "", "False"]])
+def test_bool_columns(values):
+    rows = "".join(f"<tr><td>{v}</td></tr>" for v in values)
+    assert_matches_read_html(f"<table><tr><th>A</th></tr>{rows}</table>")